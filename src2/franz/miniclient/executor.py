@@ -0,0 +1,241 @@
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+from __future__ import with_statement
+import pycurl, re, sys, collections
+from threading import RLock
+from request import Pool, PoolExhaustedError, hostKey, prepareRequest, reportRequest, jsonResult, nullResult, raiseRequestError
+
+class CancelledError(Exception):
+    """The error of a future whose request was cancelled."""
+    def __str__(self): return "The request was cancelled."
+
+class Future(object):
+    """The outcome of a request submitted to an Executor. Waiting for
+    it with result() drives the executor, so requests make progress
+    in whichever thread asks for a result."""
+    def __init__(self, executor):
+        self.executor = executor
+        self.finished = False
+        self.value = None
+        self.error = None
+        self.callbacks = []
+
+    def done(self):
+        return self.finished
+
+    def result(self):
+        """Wait for the request, return its value or raise its error."""
+        self.executor.waitFor(self)
+        if self.error:
+            raise self.error[0], self.error[1], self.error[2]
+        return self.value
+
+    def exception(self):
+        """Wait for the request, return its error or None."""
+        self.executor.waitFor(self)
+        return self.error and self.error[1]
+
+    def addDoneCallback(self, fn):
+        """Call fn with this future once it is done (right away when
+        it already is)."""
+        if self.finished: fn(self)
+        else: self.callbacks.append(fn)
+
+    def then(self, fn):
+        """A future for fn applied to the value of this one."""
+        future = Future(self.executor)
+        def chain(self):
+            if self.error: future._fail(self.error)
+            else: future._run(fn, self.value)
+        self.addDoneCallback(chain)
+        return future
+
+    def _run(self, fn, *args):
+        try:
+            value = fn(*args)
+        except Exception:
+            self._fail(sys.exc_info())
+        else:
+            self._set(value)
+
+    def _set(self, value):
+        self.value = value
+        self._done()
+
+    def _fail(self, error):
+        self.error = error
+        self._done()
+
+    def _done(self):
+        self.finished = True
+        callbacks, self.callbacks = self.callbacks, []
+        for fn in callbacks: fn(self)
+
+
+class Executor(object):
+    """Performs requests concurrently from a single thread, using a
+    pycurl.CurlMulti. At most maxConcurrent transfers run at the same
+    time, the rest wait their turn. Handles are taken from, and given
+    back to, the shared Pool, so kept-alive connections are reused.
+
+    Requests are submitted with jsonRequest/nullRequest, which take
+    the same arguments as the functions in the request module but
+    return a Future. Setting the executor of a Service (see
+    Service.withExecutor) makes all its methods behave that way."""
+    def __init__(self, maxConcurrent=8):
+        self.maxConcurrent = maxConcurrent
+        self.multi = pycurl.CurlMulti()
+        self.waiting = collections.deque()
+        self.running = {}
+        self.lock = RLock()
+        self._completedAny = False
+
+    def jsonRequest(self, obj, method, url, body=None, contentType="application/x-www-form-urlencoded", rowreader=None, accept="application/json"):
+        if rowreader is None:
+            return self.submit(obj, method, url, body, accept, contentType,
+                               then=lambda (status, body): jsonResult(status, body, accept))
+        else:
+            return self.submit(obj, method, url, body, accept, contentType,
+                               callback=rowreader.process, errCallback=raiseRequestError)
+
+    def nullRequest(self, obj, method, url, body=None, contentType="application/x-www-form-urlencoded"):
+        return self.submit(obj, method, url, body, "application/json", contentType,
+                           then=lambda (status, body): nullResult(status, body))
+
+    def submit(self, obj, method, url, body=None, accept="*/*", contentType=None, callback=None, errCallback=None, then=None):
+        """Queue a request, see makeRequest. The future produces the
+        (status, body) pair, or then applied to it. Nothing is sent
+        until the executor is driven by run() or by waiting for a
+        future."""
+        if not re.match("https?:", url): url = obj.url + url
+        future = Future(self)
+        with self.lock:
+            self.waiting.append((future, (obj, method, url, body, accept, contentType, callback, errCallback), then))
+        return future
+
+    def completed(self, value):
+        """A future that is already done, producing value."""
+        future = Future(self)
+        future._set(value)
+        return future
+
+    def run(self):
+        """Perform all submitted requests."""
+        while self.step(): pass
+
+    def cancel(self):
+        """Drop the requests that have not started, and abort the
+        running transfers. Their futures fail with CancelledError.
+        Aborted handles are closed rather than given back to the pool,
+        since their connections are in an unknown state."""
+        with self.lock:
+            waiting, self.waiting = self.waiting, collections.deque()
+            running, self.running = self.running, {}
+            pool = Pool.instance()
+            for curl, (future, key, args, finish, then) in running.items():
+                self.multi.remove_handle(curl)
+                curl.close()
+                pool.discard(key)
+            error = (CancelledError, CancelledError(), None)
+            for future, args, then in waiting:
+                future._fail(error)
+            for future, key, args, finish, then in running.values():
+                future._fail(error)
+
+    def iterRows(self, submit):
+        """Iterate over the rows of a streaming request. submit is
+        called with a row callback and must return the future of the
+        request. Rows are yielded as they arrive, while the other
+        requests of the executor keep making progress."""
+        rows = collections.deque()
+        future = submit(lambda row, names: rows.append(row))
+        while True:
+            while rows: yield rows.popleft()
+            if future.done(): break
+            self.step()
+        future.result()
+
+    def fdset(self):
+        """The sockets of the running transfers, as returned by
+        CurlMulti.fdset. Programs with their own select loop can wait
+        on these and call step(0) when one is ready."""
+        with self.lock:
+            return self.multi.fdset()
+
+    def waitFor(self, future):
+        while not future.done():
+            if not self.step():
+                raise RuntimeError("Waiting for a future that was never submitted to this executor")
+
+    def step(self, timeout=1.0):
+        """Start waiting requests while there is room, move data for
+        the running ones and complete those that finished. Waits at
+        most timeout seconds for the network when no request
+        finished. Returns False when there was nothing to do."""
+        with self.lock:
+            self._start()
+            if not self.running: return False
+            while True:
+                ret, active = self.multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM: break
+            self._collect()
+            if self.running and active and not self._completedAny:
+                self.multi.select(timeout)
+            return True
+
+    def _start(self):
+        pool = Pool.instance()
+        while self.waiting and len(self.running) < self.maxConcurrent:
+            future, args, then = self.waiting[0]
+            key = hostKey(args[2])
+            try:
+                # With transfers running, blocking here would wait for
+                # handles that only this thread can give back.
+                if self.running: curl = pool.get(key, block=False)
+                else: curl = pool.get(key)
+            except PoolExhaustedError:
+                if self.running: return
+                self.waiting.popleft()
+                future._fail(sys.exc_info())
+                continue
+            self.waiting.popleft()
+            try:
+                finish = prepareRequest(curl, *args)
+                self.multi.add_handle(curl)
+            except Exception:
+                pool.put(key, curl)
+                future._fail(sys.exc_info())
+                continue
+            self.running[curl] = (future, key, args, finish, then)
+
+    def _collect(self):
+        self._completedAny = False
+        while True:
+            queued, ok, failed = self.multi.info_read()
+            for curl in ok:
+                self._complete(curl, None)
+            for curl, errno, message in failed:
+                self._complete(curl, pycurl.error(errno, message))
+            if not queued: break
+
+    def _complete(self, curl, error):
+        self._completedAny = True
+        future, key, args, finish, then = self.running.pop(curl)
+        self.multi.remove_handle(curl)
+        reportRequest(curl, args[1], args[2], error)
+        try:
+            if error: raise error
+            value = finish()
+        except Exception:
+            Pool.instance().put(key, curl)
+            future._fail(sys.exc_info())
+            return
+        Pool.instance().put(key, curl)
+        if then: future._run(then, value)
+        else: future._set(value)
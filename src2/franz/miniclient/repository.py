@@ -6,17 +6,58 @@
 # http://www.eclipse.org/legal/epl-v10.html
 ###############################################################################
 
-import time, cjson, math, re, threading
+import time, cjson, collections, math, re, threading
 from request import *
+from executor import Executor
+
+def encodeBindings(bindings):
+    """The query string parameters for a dict of SPARQL variable
+    bindings, each term in N-Triples syntax."""
+    if not bindings: return ""
+    return "".join(["&$" + urllib.quote(a) + "=" + urllib.quote(b.encode("utf-8")) for a, b in bindings.items()])
 
 class Service(object):
+    executor = None
+    compressLevel = None
+    compressThreshold = 16384
+
     def __init__(self, url, user=None, password=None):
         self.url = url
         self.user = user
         self.password = password
 
     def _instanceFromUrl(self, constructor, url):
-        return constructor(url, self.user, self.password)
+        return self._share(constructor(url, self.user, self.password))
+
+    def _share(self, instance):
+        """Give a service opened from this one the same settings."""
+        instance.executor = self.executor
+        instance.compressLevel = self.compressLevel
+        instance.compressThreshold = self.compressThreshold
+        return instance
+
+    def setRequestCompression(self, level=6, threshold=16384):
+        """Send data bodies (statements, files and other bodies with a
+        content type, not form encoded parameters) of at least
+        threshold bytes gzip compressed (Content-Encoding: gzip), at
+        the given zlib level. Compression happens while the body is
+        streamed to the server. Data of unknown size, such as
+        generators, is always compressed. A level of None turns compression off. Services
+        opened from this one afterwards inherit the setting."""
+        self.compressLevel = level
+        self.compressThreshold = threshold
+
+    def withExecutor(self, executor):
+        """Returns a copy of this object whose methods submit their
+        requests to executor (see executor.Executor) and return
+        Futures instead of waiting for the server. A copy made of a
+        repository with an open session uses that session, but does
+        not manage it: open and close sessions on the original."""
+        copy = self.__class__.__new__(self.__class__)
+        copy.__dict__.update(self.__dict__)
+        copy.executor = executor
+        if isinstance(copy, Repository): copy.sessionAlive = None
+        return copy
     
     def toBaseClient(self):
         url = re.match("^https?://[^/]+", self.url).group(0)
@@ -26,17 +67,17 @@ class Service(object):
 class Catalog(Service):
     def listRepositories(self):
         """Returns the names of repositories in the catalog."""
-        repos = jsonRequest(self, "GET", "/repositories")
-        return [repo["id"] for repo in repos]
+        return mapResult(self, jsonRequest(self, "GET", "/repositories"),
+                         lambda repos: [repo["id"] for repo in repos])
 
     def createRepository(self, name):
         """Ask the server to create a new repository."""
-        nullRequest(self, "PUT", "/repositories/" + urllib.quote(name))
-        return self.getRepository(name)
+        return mapResult(self, nullRequest(self, "PUT", "/repositories/" + urllib.quote(name)),
+                         lambda _: self.getRepository(name))
 
     def deleteRepository(self, name):
         """Delete a repository in this catalog."""
-        nullRequest(self, "DELETE", "/repositories/" + urllib.quote(name))
+        return nullRequest(self, "DELETE", "/repositories/" + urllib.quote(name))
 
     def getRepository(self, name):
         """Create an access object for a triple store."""
@@ -48,7 +89,8 @@ class Client(Catalog):
         return jsonRequest(self, "GET", "/version")
     
     def listCatalogs(self):
-        return [cat["id"] if cat["id"] != "/" else None for cat in jsonRequest(self, "GET", "/catalogs")]
+        return mapResult(self, jsonRequest(self, "GET", "/catalogs"),
+                         lambda cats: [cat["id"] if cat["id"] != "/" else None for cat in cats])
 
     def openCatalog(self, uriOrName):
         if (uriOrName.startswith("http://")):
@@ -67,17 +109,19 @@ class Client(Catalog):
 
     def setInitfile(self, content=None, restart=True):
         if (content is None):
-            nullRequest(self, "DELETE", "/initfile")
+            return nullRequest(self, "DELETE", "/initfile")
         else:
-            nullRequest(self, "PUT", "/initfile?" + urlenc(restart=restart), content)
+            return nullRequest(self, "PUT", "/initfile?" + urlenc(restart=restart), content)
 
     def openSession(self, spec, autocommit=False, lifetime=None, loadinitfile=False):
-        url = jsonRequest(self, "POST", "/session?" +
-                          urlenc(autoCommit=autocommit, lifetime=lifetime,
-                                 loadInitFile=loadinitfile, store=spec))
-        rep = self._instanceFromUrl(Repository, url)
-        rep._enableSession(lifetime)
-        return rep
+        def makeRepository(url):
+            rep = self._instanceFromUrl(Repository, url)
+            rep._enableSession(lifetime)
+            return rep
+        return mapResult(self, jsonRequest(self, "POST", "/session?" +
+                                           urlenc(autoCommit=autocommit, lifetime=lifetime,
+                                                  loadInitFile=loadinitfile, store=spec)),
+                         makeRepository)
 
 class Repository(Service):
     def getSize(self, context=None):
@@ -86,7 +130,8 @@ class Repository(Service):
 
     def listContexts(self):
         """Lists the contexts (named graphs) that are present in this repository."""
-        return [t["contextID"] for t in jsonRequest(self, "GET", "/contexts")]
+        return mapResult(self, jsonRequest(self, "GET", "/contexts"),
+                         lambda contexts: [t["contextID"] for t in contexts])
 
     def evalSparqlQuery(self, query, infer=False, context=None, namedContext=None, callback=None,
                         bindings=None, planner=None, checkVariables=None, count=False, accept=None):
@@ -99,45 +144,82 @@ class Repository(Service):
         ASK queries."""
         if accept is None:
             accept="text/integer" if count else "application/json"
-        if bindings is not None:
-            bindings = "".join(["&$" + urllib.quote(a) + "=" + urllib.quote(b.encode("utf-8")) for a, b in bindings.items()])
         return jsonRequest(self, "GET", self.url,
                            urlenc(query=query, infer=infer, context=context, namedContext=namedContext,
-                                  planner=planner, checkVariables=checkVariables) + (bindings or ""),
-                           rowreader=callback and RowReader(callback),
+                                  planner=planner, checkVariables=checkVariables) + encodeBindings(bindings),
+                           rowreader=makeRowReader(callback),
                            accept=accept)
 
+    def evalSparqlQueryMany(self, query, bindingSets, infer=False, context=None, namedContext=None,
+                            planner=None, checkVariables=None, accept="application/json", maxConcurrent=8):
+        """Execute a SPARQL query once for every dict of bindings that
+        the iterable bindingSets produces. The query is encoded once,
+        and up to maxConcurrent requests run at the same time over
+        pooled connections (see executor.Executor), while bindingSets
+        is read only as far as needed to keep them busy. Yields
+        (index, result) pairs, with the position of the bindings in
+        bindingSets, in the order the requests complete. The error of
+        a failing request is raised by the iteration. When it fails, or
+        is closed before the end, the remaining requests are cancelled
+        (see Executor.cancel)."""
+        params = urlenc(query=query, infer=infer, context=context, namedContext=namedContext,
+                        planner=planner, checkVariables=checkVariables)
+        executor = Executor(maxConcurrent)
+        pending = set()
+        completed = collections.deque()
+        sets = enumerate(bindingSets)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < 2 * maxConcurrent:
+                    try:
+                        index, bindings = sets.next()
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = executor.jsonRequest(self, "GET", self.url, params + encodeBindings(bindings), accept=accept)
+                    future.addDoneCallback(lambda future, index=index: completed.append((index, future)))
+                    pending.add(index)
+                while completed:
+                    index, future = completed.popleft()
+                    pending.discard(index)
+                    yield index, future.result()
+                if not pending: break
+                executor.step()
+        finally:
+            executor.cancel()
+
     def evalPrologQuery(self, query, infer=False, callback=None, limit=None, count=False, accept=None):
         """Execute a Prolog query. Returns a {names, values} object."""
         if accept is None:
             accept="text/integer" if count else "application/json"
         return jsonRequest(self, "POST", self.url,
                            urlenc(query=query, infer=infer, queryLn="prolog", limit=limit),
-                           rowreader=callback and RowReader(callback),
+                           rowreader=makeRowReader(callback),
                            accept=accept)
 
     def definePrologFunctors(self, definitions):
         """Add Prolog functors to the environment. Takes a string
         containing Lisp-syntax functor definitions (using the <-- and
         <- operators)."""
-        nullRequest(self, "POST", "/functor", definitions)
+        return nullRequest(self, "POST", "/functor", definitions)
 
     def evalInServer(self, code):
         """Evaluate Common Lisp code in the server."""
         return jsonRequest(self, "POST", "/eval", code)
 
     def commit(self):
-        nullRequest(self, "POST", "/commit")
+        return nullRequest(self, "POST", "/commit")
 
     def rollback(self):
-        nullRequest(self, "POST", "/rollback")
+        return nullRequest(self, "POST", "/rollback")
 
     def getStatements(self, subj=None, pred=None, obj=None, context=None, infer=False, callback=None,
                       limit=None, tripleIDs=False, count=False):
         """Retrieve all statements matching the given constraints.
         Context can be None or a list of contexts, as in
         evalSparqlQuery."""
-        if subj == [] or pred == [] or obj == [] or context == []: return []
+        if subj == [] or pred == [] or obj == [] or context == []: return constantResult(self, [])
         subjEnd, predEnd, objEnd = None, None, None
         if isinstance(subj, tuple): subj, subjEnd = subj
         if isinstance(pred, tuple): pred, predEnd = pred
@@ -149,7 +231,7 @@ class Repository(Service):
         return jsonRequest(self, "GET", "/statements",
                            urlenc(subj=subj, subjEnd=subjEnd, pred=pred, predEnd=predEnd,
                                   obj=obj, objEnd=objEnd, context=context, infer=infer, limit=limit),
-                           rowreader=callback and RowReader(callback), accept=accept)
+                           rowreader=makeRowReader(callback), accept=accept)
 
     def getStatementsById(self, ids, returnIDs=True):
         return jsonRequest(self, "GET", "/statements/id", urlenc(id=ids),
@@ -157,60 +239,86 @@ class Repository(Service):
 
     def addStatement(self, subj, pred, obj, context=None):
         """Add a single statement to the repository."""
-        nullRequest(self, "POST", "/statements", cjson.encode([[subj, pred, obj, context]]),
+        return nullRequest(self, "POST", "/statements", cjson.encode([[subj, pred, obj, context]]),
                     contentType="application/json")
 
     def deleteMatchingStatements(self, subj=None, pred=None, obj=None, context=None):
         """Delete all statements matching the constraints from the
         repository. Context can be None or a single graph name."""
-        nullRequest(self, "DELETE", "/statements",
+        return nullRequest(self, "DELETE", "/statements",
                     urlenc(subj=subj, pred=pred, obj=obj, context=context))
 
     def addStatements(self, quads, commitEvery=None):
         """Add a collection of statements to the repository. Quads
         should be an array of four-element arrays, where the fourth
-        element, the graph name, may be None."""
-        nullRequest(self, "POST", "/statements" + urlenc(commit=commitEvery), cjson.encode(quads), contentType="application/json")
+        element, the graph name, may be None. Quads can also be a
+        string that already holds their JSON encoding."""
+        if not isinstance(quads, str): quads = cjson.encode(quads)
+        return nullRequest(self, "POST", "/statements?" + urlenc(commit=commitEvery), quads, contentType="application/json")
 
     class UnsupportedFormatError(Exception):
         def __init__(self, format): self.format = format
-        def __str__(self): return "'%s' file format not supported (try 'ntriples' or 'rdf/xml')." % self.format
+        def __str__(self): return "'%s' file format not supported (try 'ntriples', 'nquads' or 'rdf/xml')." % self.format
 
     def checkFormat(self, format):
         if format == "ntriples": return "text/plain"
+        elif format == "nquads": return "text/x-nquads"
         elif format == "rdf/xml": return "application/rdf+xml"
         else: raise Repository.UnsupportedFormatError(format)
 
     def loadData(self, data, format, baseURI=None, context=None, commitEvery=None):
-        nullRequest(self, "POST", "/statements?" + urlenc(context=context, baseURI=baseURI, commit=commitEvery),
-                    data.encode("utf-8"), contentType=self.checkFormat(format))
-
-    def loadFile(self, file, format, baseURI=None, context=None, serverSide=False, commitEvery=None):
+        """Load a string of data in the given format. Data can also be
+        a file object or an iterable producing strings, in which case
+        it is streamed to the server."""
+        if isinstance(data, unicode): data = data.encode("utf-8")
+        return nullRequest(self, "POST", "/statements?" + urlenc(context=context, baseURI=baseURI, commit=commitEvery),
+                    data, contentType=self.checkFormat(format))
+
+    def loadFile(self, file, format, baseURI=None, context=None, serverSide=False, commitEvery=None, threaded=True):
+        """Load a file. When serverSide is false, the file is read on
+        the client and streamed to the server, otherwise the server
+        reads it from its own file system. Files ending in .gz or .bz2
+        are always read on the client, and decompressed as they are
+        streamed; on a separate thread when threaded is true."""
         mime = self.checkFormat(format)
+        compression = fileCompression(file)
         body = ""
-        if not serverSide:
-            f = open(file)
-            body = f.read()
-            f.close()
+        if compression or not serverSide:
+            serverSide = False
+            body = open(file, "rb")
             file = None
+        data = body
+        if compression:
+            data = decompressedChunks(bodyChunks(body), compression)
+            if threaded: data = threadedChunks(data)
         params = urlenc(file=file, context=context, baseURI=baseURI, commit=commitEvery)
-        nullRequest(self, "POST", "/statements?" + params, body, contentType=mime)
+        def closeBody():
+            # Also stops the decompressing thread when the upload failed
+            if compression: data.close()
+            if not serverSide: body.close()
+        try:
+            result = nullRequest(self, "POST", "/statements?" + params, data, contentType=mime)
+        finally:
+            if not self.executor: closeBody()
+        if self.executor:
+            result.addDoneCallback(lambda future: closeBody())
+        return result
 
     def getBlankNodes(self, amount=1):
         return jsonRequest(self, "POST", "/blankNodes", urlenc(amount=amount))
 
     def deleteStatements(self, quads):
         """Delete a collection of statements from the repository."""
-        nullRequest(self, "POST", "/statements/delete", cjson.encode(quads), contentType="application/json")
+        return nullRequest(self, "POST", "/statements/delete", cjson.encode(quads), contentType="application/json")
 
     def deleteStatementsById(self, ids):
-        nullRequest(self, "POST", "/statements/delete?ids=true", cjson.encode(ids), contentType="application/json")
+        return nullRequest(self, "POST", "/statements/delete?ids=true", cjson.encode(ids), contentType="application/json")
 
     def evalFreeTextSearch(self, pattern, index=None, infer=False, callback=None, limit=None):
         """Use free-text indices to search for the given pattern.
         Returns an array of statements."""
         return jsonRequest(self, "GET", "/freetext", urlenc(pattern=pattern, infer=infer, limit=limit, index=index),
-                           rowreader=callback and RowReader(callback))
+                           rowreader=makeRowReader(callback))
 
     def listFreeTextIndices(self):
         """List the names of free-text indices defined in this
@@ -238,7 +346,7 @@ class Repository(Service):
         # value.
         if stopWords == []: stopWords = ""
         if indexFields == []: indexFields = ""
-        nullRequest(self, "PUT", "/freetext/indices/" + urllib.quote(index),
+        return nullRequest(self, "PUT", "/freetext/indices/" + urllib.quote(index),
                     urlenc(predicate=predicates, indexLiterals=indexLiterals and True,
                            indexLiteralType=indexLiterals if isinstance(indexLiterals, list) else None,
                            indexResources=indexResources, indexField=indexFields,
@@ -255,7 +363,7 @@ class Repository(Service):
         if predicates == []: predicates = ""
         if indexFields == []: indexFields = ""
         if wordFilters == []: wordFilters = ""
-        nullRequest(self, "POST", "/freetext/indices/" + urllib.quote(index),
+        return nullRequest(self, "POST", "/freetext/indices/" + urllib.quote(index),
                     urlenc(predicate=predicates, indexLiterals=indexLiterals and True,
                            indexLiteralType=indexLiterals if isinstance(indexLiterals, list) else None,
                            indexResources=indexResources, indexField=indexFields,
@@ -264,7 +372,7 @@ class Repository(Service):
 
     def deleteFreeTextIndex(self, index):
         """Delete the named free-text index."""
-        nullRequest(self, "DELETE", "/freetext/indices/" + urllib.quote(index))
+        return nullRequest(self, "DELETE", "/freetext/indices/" + urllib.quote(index))
 
     def listFreeTextPredicates(self):
         """List the predicates that are used for free-text indexing."""
@@ -272,7 +380,7 @@ class Repository(Service):
 
     def registerFreeTextPredicate(self, predicate):
         """Add a predicate for free-text indexing."""
-        nullRequest(self, "POST", "/freetext/predicates", urlenc(predicate=predicate))
+        return nullRequest(self, "POST", "/freetext/predicates", urlenc(predicate=predicate))
 
     def clearNamespaces(self, reset=True):
         """
@@ -280,14 +388,14 @@ class Repository(Service):
         `reset` argument of `True` is passed, the user's namespaces are reset
         to the default set of namespaces, otherwise all namespaces are cleared.
         """
-        nullRequest(self, "DELETE", "/namespaces?" + urlenc(reset=reset))
+        return nullRequest(self, "DELETE", "/namespaces?" + urlenc(reset=reset))
 
     def addNamespace(self, prefix, uri):
-        nullRequest(self, "PUT", "/namespaces/" + urllib.quote(prefix),
+        return nullRequest(self, "PUT", "/namespaces/" + urllib.quote(prefix),
                     uri, contentType="text/plain")
 
     def deleteNamespace(self, prefix):
-        nullRequest(self, "DELETE", "/namespaces/" + urllib.quote(prefix))
+        return nullRequest(self, "DELETE", "/namespaces/" + urllib.quote(prefix))
 
     def listNamespaces(self):
         return jsonRequest(self, "GET", "/namespaces")
@@ -299,20 +407,20 @@ class Repository(Service):
         return jsonRequest(self, "GET", "/mapping/type")
 
     def addMappedType(self, type, encoding):
-        nullRequest(self, "POST", "/mapping/type", urlenc(type=type, encoding=encoding))
+        return nullRequest(self, "POST", "/mapping/type", urlenc(type=type, encoding=encoding))
 
     def deleteMappedType(self, type):
-        nullRequest(self, "DELETE", "/mapping/type", urlenc(type=type))
+        return nullRequest(self, "DELETE", "/mapping/type", urlenc(type=type))
 
     def listMappedPredicates(self):
         return jsonRequest(self, "GET", "/mapping/predicate")
 
     def addMappedPredicate(self, predicate, encoding):
-        nullRequest(self, "POST", "/mapping/predicate",
+        return nullRequest(self, "POST", "/mapping/predicate",
                     urlenc(predicate=predicate, encoding=encoding))
 
     def deleteMappedPredicate(self, predicate):
-        nullRequest(self, "DELETE", "/mapping/predicate", urlenc(predicate=predicate))
+        return nullRequest(self, "DELETE", "/mapping/predicate", urlenc(predicate=predicate))
 
     def getCartesianGeoType(self, stripWidth, xMin, xMax, yMin, yMax):
         """Retrieve a cartesian geo-spatial literal type."""
@@ -386,7 +494,7 @@ class Repository(Service):
     def createPolygon(self, resource, points):
         """Create a polygon with the given name in the store. points
         should be a list of literals created with createCartesianGeoLiteral."""
-        nullRequest(self, "PUT", "/geo/polygon?" + urlenc(resource=resource, point=points))
+        return nullRequest(self, "PUT", "/geo/polygon?" + urlenc(resource=resource, point=points))
 
     def registerSNAGenerator(self, name, subjectOf=None, objectOf=None, undirected=None, query=None):
         """subjectOf, objectOf, and undirected can be either a single
@@ -394,27 +502,28 @@ class Repository(Service):
         query in the form (select ?x (q- ?node !<mypredicate> ?x)),
         where ?node always returns to the argument passed to the
         generator."""
-        nullRequest(self, "PUT", "/snaGenerators/" + urllib.quote(name) + "?" +
+        return nullRequest(self, "PUT", "/snaGenerators/" + urllib.quote(name) + "?" +
                     urlenc(subjectOf=subjectOf, objectOf=objectOf, undirected=undirected, query=query))
 
     def registerNeighborMatrix(self, name, group, generator, depth):
         """group is a list of nodes, generator the name of an SNA generator."""
-        nullRequest(self, "PUT", "/neighborMatrices/" + urllib.quote(name) + "?" +
+        return nullRequest(self, "PUT", "/neighborMatrices/" + urllib.quote(name) + "?" +
                     urlenc(group=group, depth=depth, generator=generator))
 
     def getTripleCacheSize(self):
-        return jsonRequest(self, "GET", "/tripleCache") or False
+        return mapResult(self, jsonRequest(self, "GET", "/tripleCache"), lambda size: size or False)
 
     def disableTripleCache(self):
-        nullRequest(self, "DELETE", "/tripleCache")
+        return nullRequest(self, "DELETE", "/tripleCache")
 
     def enableTripleCache(self, size=None):
-        nullRequest(self, "PUT", "/tripleCache?" + urlenc(size=size))
+        return nullRequest(self, "PUT", "/tripleCache?" + urlenc(size=size))
 
     sessionAlive = None
     
     def openSession(self, autocommit=False, lifetime=None, loadinitfile=False):
         if self.sessionAlive: return
+        if self.executor: raise ValueError("Sessions can not be opened through an executor")
         self.oldUrl = self.url
         self.url = jsonRequest(self, "POST", "/session?" + urlenc(autoCommit=autocommit,
             lifetime=lifetime, loadInitFile=loadinitfile))
@@ -426,7 +535,9 @@ class Repository(Service):
             while True:
                 stop = alive.wait(max(lifetime - 60, lifetime) if lifetime else 250)
                 if alive.isSet(): return
-                try: nullRequest(self, "GET", "/session/ping")
+                # Sent directly: the pings come from a thread of their
+                # own, even for repositories that use an executor.
+                try: nullResult(*makeRequest(self, "GET", "/session/ping"))
                 except Exception: return
         threading.Thread(target=pingSession).start()
 
@@ -440,7 +551,67 @@ class Repository(Service):
 
     def setAutoCommit(self, on):
         """Only allowed when a session is active."""
-        nullRequest(self, "POST", "/session/autoCommit?" + urlenc(on=on))
+        return nullRequest(self, "POST", "/session/autoCommit?" + urlenc(on=on))
 
     def __del__(self):
         self.closeSession()
+
+
+class AsyncService(object):
+    """Mixin for services whose methods submit their requests to an
+    executor and return Futures. Without an explicit executor, each
+    client gets one of its own; catalogs and repositories opened from
+    it share it."""
+    def __init__(self, url, user=None, password=None, executor=None, maxConcurrent=64):
+        Service.__init__(self, url, user, password)
+        self.executor = executor or Executor(maxConcurrent)
+
+    def _instanceFromUrl(self, constructor, url):
+        constructor = ASYNC_CLASSES.get(constructor, constructor)
+        return self._share(constructor(url, self.user, self.password, self.executor))
+
+class AsyncClient(AsyncService, Client):
+    pass
+
+class AsyncCatalog(AsyncService, Catalog):
+    pass
+
+class AsyncRepository(AsyncService, Repository):
+    """A Repository whose methods return Futures. Use iterStatements
+    and iterSparqlQuery to go over large results row by row."""
+    def iterStatements(self, subj=None, pred=None, obj=None, context=None, infer=False, limit=None, tripleIDs=False):
+        return self.executor.iterRows(lambda callback: self.getStatements(
+            subj, pred, obj, context, infer, callback=callback, limit=limit, tripleIDs=tripleIDs))
+
+    def iterSparqlQuery(self, query, infer=False, context=None, namedContext=None, bindings=None, planner=None):
+        return self.executor.iterRows(lambda callback: self.evalSparqlQuery(
+            query, infer, context, namedContext, callback, bindings=bindings, planner=planner))
+
+    def openSession(self, autocommit=False, lifetime=None, loadinitfile=False):
+        """Returns a Future. Wait for it before submitting requests
+        that should go to the session."""
+        if self.sessionAlive: return self.executor.completed(None)
+        def enable(url):
+            self.oldUrl = self.url
+            self.url = url
+            self._enableSession(lifetime)
+        return jsonRequest(self, "POST", "/session?" + urlenc(autoCommit=autocommit,
+            lifetime=lifetime, loadInitFile=loadinitfile)).then(enable)
+
+    def closeSession(self):
+        if not self.sessionAlive: return self.executor.completed(None)
+        self.sessionAlive.set()
+        self.sessionAlive = None
+        future = nullRequest(self, "POST", "/session/close")
+        if hasattr(self, "oldUrl"): self.url = self.oldUrl
+        return future
+
+    def __del__(self):
+        # Nothing would drive the executor for a request submitted
+        # here, so the session is closed directly.
+        if not self.sessionAlive: return
+        self.sessionAlive.set()
+        try: makeRequest(self, "POST", "/session/close")
+        except Exception: pass
+
+ASYNC_CLASSES = {Client: AsyncClient, Catalog: AsyncCatalog, Repository: AsyncRepository}
@@ -6,12 +6,42 @@
 # http://www.eclipse.org/legal/epl-v10.html
 ###############################################################################
 
-import StringIO, pycurl, urllib, cjson, locale, re, os
-from threading import Lock
+import StringIO, pycurl, urllib, urlparse, cjson, locale, re, os, sys, time, bz2, zlib, collections, Queue
+from threading import Condition, Event, Lock, Thread
 
 curlPool = None
 
+def hostKey(url):
+    """The part of a URL that identifies a server: scheme, host and
+    port. Handles are pooled per key, since a kept-alive connection
+    can only be reused for requests to the same server."""
+    parts = urlparse.urlsplit(url)
+    port = parts.port or (parts.scheme == "https" and 443 or 80)
+    return "%s://%s:%d" % (parts.scheme, parts.hostname, port)
+
+class PoolExhaustedError(Exception):
+    def __init__(self, key): self.key = key
+    def __str__(self): return "No curl handle for %s became available." % self.key
+
 class Pool:
+    """Curl handles, kept per server (see hostKey) so that requests
+    reuse their kept-alive connections. The limits below apply to
+    every server separately and can be changed with configure()."""
+
+    # Maximum number of handles per server, idle or in use. None
+    # means no limit.
+    maxSize = None
+    # Idle handles older than this many seconds are closed. None
+    # means they are kept forever.
+    idleTimeout = None
+    # What get() does when maxSize handles are in use: wait for one
+    # (at most timeout seconds, when that is not None), or raise
+    # PoolExhaustedError right away.
+    block = True
+    timeout = None
+
+    COUNTERS = ("hits", "misses", "creates", "evicts", "waits", "timeouts", "requests", "connects")
+
     @staticmethod
     def instance():
         global curlPool
@@ -25,38 +55,313 @@ class Pool:
             curlPool = Pool(pycurl.Curl, pid)
 
         return curlPool
-        
+
+    @staticmethod
+    def configure(maxSize=None, idleTimeout=None, block=True, timeout=None):
+        """Set the limits used by the pool of this and any forked
+        process."""
+        Pool.maxSize = maxSize
+        Pool.idleTimeout = idleTimeout
+        Pool.block = block
+        Pool.timeout = timeout
+        pool = Pool.instance()
+        pool.lock.acquire()
+        try:
+            pool.lock.notifyAll()
+        finally:
+            pool.lock.release()
+
     def __init__(self, create, pid):
         self.create = create
         self.pid = pid
-        self.lock = Lock()
-        self.pool = []
+        self.lock = Condition(Lock())
+        # Per key: idle handles with the time they were returned,
+        # oldest first, and the number of handles idle or in use.
+        self.idle = {}
+        self.size = {}
+        self.counters = {}
+
+    def _counters(self, key):
+        counters = self.counters.get(key)
+        if counters is None:
+            counters = self.counters[key] = dict.fromkeys(Pool.COUNTERS, 0)
+        return counters
 
-    def get(self):
+    def _evict(self, now):
+        if self.idleTimeout is None: return
+        for key, idle in self.idle.iteritems():
+            while idle and idle[0][1] + self.idleTimeout < now:
+                idle.pop(0)[0].close()
+                self.size[key] -= 1
+                self._counters(key)["evicts"] += 1
+
+    def get(self, key=None, block=None):
+        """Take an idle handle for key, or create one. block overrides
+        the configured blocking behaviour for this call."""
+        if block is None: block = self.block
         self.lock.acquire()
         try:
-            value = self.pool.pop()
-        except IndexError:
-            value = None
+            counters = self._counters(key)
+            self._evict(time.time())
+            idle = self.idle.get(key)
+            if idle:
+                counters["hits"] += 1
+                return idle.pop()[0]
+            counters["misses"] += 1
+
+            deadline = self.timeout is not None and time.time() + self.timeout
+            if self.maxSize is not None and self.size.get(key, 0) >= self.maxSize:
+                if not block: raise PoolExhaustedError(key)
+                counters["waits"] += 1
+            while self.maxSize is not None and self.size.get(key, 0) >= self.maxSize:
+                if deadline:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        counters["timeouts"] += 1
+                        raise PoolExhaustedError(key)
+                    self.lock.wait(remaining)
+                else:
+                    self.lock.wait()
+                idle = self.idle.get(key)
+                if idle:
+                    counters["hits"] += 1
+                    return idle.pop()[0]
+
+            self.size[key] = self.size.get(key, 0) + 1
+            counters["creates"] += 1
         finally:
             self.lock.release()
 
         # Create new ones outside the lock
-        return value or self.create()
+        try:
+            return self.create()
+        except:
+            self.discard(key)
+            raise
 
-    def put(self, value):
+    def put(self, key, value):
         # We could call value.reset() here before returning the curl object
         # to the pool for pycurl version >= 7.19.0 if the C code for reset
         # actually incremented the reference on the returned None object.
         # As the C code is now, if called, the refcount on None eventually
         # goes to zero after enough requests and the Python interpretor
         # dies a quick death.
+        connects = value.getinfo(pycurl.NUM_CONNECTS)
+        now = time.time()
+        self.lock.acquire()
+        try:
+            counters = self._counters(key)
+            counters["requests"] += 1
+            counters["connects"] += connects
+            if self.maxSize is not None and self.size[key] > self.maxSize:
+                # The pool was made smaller while this was in use.
+                value.close()
+                self.size[key] -= 1
+                counters["evicts"] += 1
+            else:
+                self.idle.setdefault(key, []).append((value, now))
+            self._evict(now)
+            self.lock.notify()
+        finally:
+            self.lock.release()
+
+    def discard(self, key):
+        """Forget a handle taken with get() that will not be put back."""
         self.lock.acquire()
         try:
-            self.pool.append(value)
+            self.size[key] -= 1
+            self.lock.notify()
         finally:
             self.lock.release()
 
+    def prewarm(self, obj, count):
+        """Open count connections to the server of obj (a Service)
+        ahead of time, by fetching its version on as many handles."""
+        key = hostKey(obj.url)
+        if self.maxSize is not None: count = min(count, self.maxSize)
+        handles = []
+        try:
+            for i in range(count):
+                handles.append(self.get(key))
+                performRequest(handles[-1], obj, "GET", key + "/version", None, "*/*", None, None, None)
+        finally:
+            for curl in handles: self.put(key, curl)
+
+    def stats(self, url=None):
+        """Returns a dictionary of counters for the server of url, or
+        summed over all servers when no url is given: hits and misses
+        of get(), handles created and evicted, gets that had to wait
+        and that timed out, and the number of requests performed and
+        of new connections they had to open. The difference of the
+        last two is the number of requests that reused a kept-alive
+        connection. The numbers of idle handles and of all handles are
+        included too."""
+        self.lock.acquire()
+        try:
+            if url is None:
+                keys = self.counters.keys()
+            else:
+                keys = [hostKey(url)]
+            result = dict.fromkeys(Pool.COUNTERS + ("idle", "size"), 0)
+            for key in keys:
+                for name, value in self.counters.get(key, {}).iteritems():
+                    result[name] += value
+                result["idle"] += len(self.idle.get(key, ()))
+                result["size"] += self.size.get(key, 0)
+            result["reused"] = result["requests"] - result["connects"]
+            return result
+        finally:
+            self.lock.release()
+
+requestListeners = []
+
+def addRequestListener(listener):
+    """Call listener with a RequestRecord after every request, from
+    the thread that performed it. See RequestMetrics."""
+    requestListeners.append(listener)
+
+def removeRequestListener(listener):
+    requestListeners.remove(listener)
+
+PATH_TEMPLATES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    ("/catalogs/[^/]+", "/catalogs/{catalog}"),
+    ("/repositories/[^/]+", "/repositories/{repository}"),
+    ("/sessions/[^/]+", "/sessions/{session}"),
+    ("/namespaces/[^/]+", "/namespaces/{prefix}"),
+    ("/freetext/indices/[^/]+", "/freetext/indices/{index}"),
+    ("/snaGenerators/[^/]+", "/snaGenerators/{generator}"),
+    ("/neighborMatrices/[^/]+", "/neighborMatrices/{matrix}"))]
+
+def pathTemplate(url):
+    """The path of url without its query, with the names of catalogs,
+    repositories and the like replaced by placeholders, so that
+    requests to the same endpoint share a template."""
+    path = urlparse.urlsplit(url).path or "/"
+    for pattern, replacement in PATH_TEMPLATES:
+        path = pattern.sub(replacement, path)
+    return path
+
+class RequestRecord(object):
+    """What curl knows about a finished request. Times are in seconds
+    since the start of the request: namelookup and connect mark the
+    end of those phases, starttransfer the arrival of the first
+    response byte, and total the end of the transfer, including any
+    time spent in streaming callbacks. Status is None, and error set,
+    when the transfer failed."""
+    def __init__(self, curl, method, url, error=None):
+        self.method = method
+        self.url = url
+        self.path = pathTemplate(url)
+        self.error = error
+        self.status = error is None and curl.getinfo(pycurl.RESPONSE_CODE) or None
+        self.namelookup = curl.getinfo(pycurl.NAMELOOKUP_TIME)
+        self.connect = curl.getinfo(pycurl.CONNECT_TIME)
+        self.starttransfer = curl.getinfo(pycurl.STARTTRANSFER_TIME)
+        self.total = curl.getinfo(pycurl.TOTAL_TIME)
+        self.uploaded = int(curl.getinfo(pycurl.SIZE_UPLOAD))
+        self.downloaded = int(curl.getinfo(pycurl.SIZE_DOWNLOAD))
+        self.reused = curl.getinfo(pycurl.NUM_CONNECTS) == 0
+
+    def __repr__(self):
+        return "<RequestRecord %s %s %s %.1fms>" % (self.method, self.path, self.status, self.total * 1000)
+
+def reportRequest(curl, method, url, error=None):
+    if not requestListeners: return
+    record = RequestRecord(curl, method, url, error)
+    for listener in list(requestListeners): listener(record)
+
+class EndpointStats(object):
+    """Aggregated records of the requests to one endpoint. The
+    histograms count requests per latency bucket, bucket n holding
+    the times from 2^(n-1) up to 2^n milliseconds (bucket 0 those
+    under one millisecond)."""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.reused = 0
+        self.uploaded = 0
+        self.downloaded = 0
+        self.starttransfer = 0.0
+        self.total = 0.0
+        self.starttransferHistogram = {}
+        self.totalHistogram = {}
+
+    def add(self, record):
+        self.count += 1
+        if record.error is not None or not 200 <= record.status < 300: self.errors += 1
+        if record.reused: self.reused += 1
+        self.uploaded += record.uploaded
+        self.downloaded += record.downloaded
+        self.starttransfer += record.starttransfer
+        self.total += record.total
+        for histogram, seconds in ((self.starttransferHistogram, record.starttransfer),
+                                   (self.totalHistogram, record.total)):
+            bucket = latencyBucket(seconds)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def percentile(self, fraction, histogram=None):
+        """The upper bound, in seconds, of the bucket holding the given
+        fraction of the total (or other) latency histogram."""
+        if histogram is None: histogram = self.totalHistogram
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= fraction * self.count:
+                return (1 << bucket) / 1000.0
+        return 0.0
+
+def latencyBucket(seconds):
+    bucket = 0
+    milliseconds = int(seconds * 1000)
+    while milliseconds:
+        milliseconds >>= 1
+        bucket += 1
+    return bucket
+
+class RequestMetrics(object):
+    """A request listener aggregating the records per endpoint, that
+    is, per method and path template. Comparing the time to the first
+    byte with the total time shows whether an endpoint is slow on the
+    server or in transferring and processing the response.
+
+        metrics = RequestMetrics()
+        addRequestListener(metrics)
+        ...
+        print metrics.report()"""
+    def __init__(self):
+        self.lock = Lock()
+        self.endpoints = {}
+
+    def __call__(self, record):
+        self.lock.acquire()
+        try:
+            key = (record.method, record.path)
+            stats = self.endpoints.get(key)
+            if stats is None: stats = self.endpoints[key] = EndpointStats()
+            stats.add(record)
+        finally:
+            self.lock.release()
+
+    def get(self, method, path):
+        """The EndpointStats for a method and path template, or None."""
+        return self.endpoints.get((method, path))
+
+    def report(self):
+        lines = []
+        for (method, path), stats in sorted(self.endpoints.items()):
+            lines.append("%s %s: %d requests (%d failed, %d reused), %d bytes up, %d down, "
+                         "first byte %.1fms, total %.1fms on average, total p50 < %gms, p99 < %gms" %
+                         (method, path, stats.count, stats.errors, stats.reused, stats.uploaded,
+                          stats.downloaded, stats.starttransfer / stats.count * 1000,
+                          stats.total / stats.count * 1000, stats.percentile(0.5) * 1000,
+                          stats.percentile(0.99) * 1000))
+        return "\n".join(lines)
+
+class AbortRequest(Exception):
+    """Raised by the callback of a streaming request to stop the
+    transfer. The request then fails with a pycurl.error."""
+    pass
+
 class RequestError(Exception):
     code = None
     
@@ -92,9 +397,175 @@ def urlenc(**args):
         encval(name, val)
     return "&".join(buf)
 
+def isStreamBody(body):
+    """Bodies that are not strings (file objects, generators, or other
+    iterables of strings) are streamed to the server instead of being
+    passed to curl as a single string."""
+    return body is not None and not isinstance(body, basestring) and \
+        (hasattr(body, "read") or hasattr(body, "__iter__"))
+
+def makeReadFunction(body):
+    """Returns a curl READFUNCTION that produces the content of a
+    file object or an iterable of strings in chunks of at most the
+    requested size. Unicode chunks are encoded as UTF-8."""
+    if hasattr(body, "read"):
+        # Encoding text read from a file can make it longer than the
+        # size asked for, which curl does not accept, so file content
+        # is buffered like the chunks of an iterable.
+        chunks = iter(lambda: body.read(BODY_CHUNK), "")
+    else:
+        chunks = iter(body)
+    pending = [""]
+    def readfunc(size):
+        data = pending[0]
+        while not data:
+            try: data = chunks.next()
+            except StopIteration: return ""
+            if isinstance(data, unicode): data = data.encode("utf-8")
+        pending[0] = data[size:]
+        return data[:size]
+    return readfunc
+
+BODY_CHUNK = 65536
+
+def bodyChunks(body):
+    """The content of a request body as an iterable of strings."""
+    if isinstance(body, basestring):
+        return (body[pos:pos + BODY_CHUNK] for pos in xrange(0, len(body), BODY_CHUNK))
+    elif hasattr(body, "read"):
+        return iter(lambda: body.read(BODY_CHUNK), "")
+    return body
+
+def bodySize(body):
+    """The size of a string or file body, None when it is not known."""
+    if isinstance(body, basestring): return len(body)
+    try: return os.fstat(body.fileno()).st_size
+    except (AttributeError, EnvironmentError, ValueError): return None
+
+def gzipChunks(chunks, level):
+    """Compress an iterable of strings to the gzip format, one chunk
+    at a time, so that neither the input nor the output has to be in
+    memory as a whole."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, unicode): chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        if data: yield data
+    yield compressor.flush()
+
+DECOMPRESSORS = {".gz": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+                 ".bz2": bz2.BZ2Decompressor}
+
+def fileCompression(path):
+    """The extension of a compressed file, ".gz" or ".bz2", or None
+    when path does not name one."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in DECOMPRESSORS: return ext
+    return None
+
+def decompressedChunks(chunks, compression):
+    """Decompress an iterable of strings in the format of the
+    compression extension (see fileCompression), one chunk at a time.
+    Files made of several concatenated streams, as written by
+    appending to them or by parallel compressors, are read whole."""
+    newDecompressor = DECOMPRESSORS[compression]
+    decompressor = newDecompressor()
+    for chunk in chunks:
+        while chunk:
+            try:
+                data = decompressor.decompress(chunk)
+            except EOFError:
+                # A bz2 stream ended exactly at the end of a chunk.
+                decompressor = newDecompressor()
+                continue
+            if data: yield data
+            chunk = decompressor.unused_data
+            if chunk: decompressor = newDecompressor()
+    if hasattr(decompressor, "flush"):
+        data = decompressor.flush()
+        if data: yield data
+
+def threadedChunks(chunks, queueSize=8):
+    """Iterate over chunks on a separate thread, keeping up to
+    queueSize of them ahead of the reader, so that producing them
+    (say, decompressing) overlaps with sending them. zlib and bz2
+    release the interpreter lock while they work. Close the generator
+    when the reader stops early, so that the thread stops too."""
+    queue = Queue.Queue(queueSize)
+    stopped = Event()
+    def offer(item):
+        while not stopped.isSet():
+            try:
+                queue.put(item, timeout=0.5)
+                return True
+            except Queue.Full:
+                pass
+        return False
+    def produce():
+        try:
+            for chunk in chunks:
+                if not offer(("chunk", chunk)): return
+            offer(("end", None))
+        except Exception:
+            offer(("error", sys.exc_info()))
+    thread = Thread(target=produce)
+    thread.setDaemon(True)
+    thread.start()
+    try:
+        while True:
+            kind, value = queue.get()
+            if kind == "chunk": yield value
+            elif kind == "error": raise value[0], value[1], value[2]
+            else: break
+    finally:
+        stopped.set()
+
+def compressBody(obj, body, contentType):
+    """Returns a streaming, gzip-compressed version of body when obj
+    asks for compressed requests (see Service.setRequestCompression)
+    and the body is data with a content type of its own, such as
+    statements or a file, at least as large as the threshold. Form
+    encoded parameters are never compressed, and data bodies of
+    unknown size always are. Returns None otherwise."""
+    level = getattr(obj, "compressLevel", None)
+    if level is None or not body or not contentType: return None
+    size = bodySize(body)
+    if size is not None and size < getattr(obj, "compressThreshold", 0): return None
+    return gzipChunks(bodyChunks(body), level)
+
 def makeRequest(obj, method, url, body=None, accept="*/*", contentType=None, callback=None, errCallback=None):
-    curl = Pool.instance().get()
+    """Perform an HTTP request. The body can be a string, a file
+    object, or an iterable producing strings. In the last two cases,
+    it is read incrementally and sent with chunked transfer encoding,
+    so that it never has to be held in memory as a whole. Compressed
+    bodies (see compressBody) are always sent that way.
+
+    Streaming (callback) requests use pooled, kept-alive handles just
+    like the others, so they reuse connections."""
+    if not re.match("https?:", url): url = obj.url + url
+    pool = Pool.instance()
+    key = hostKey(url)
+    curl = pool.get(key)
+    try:
+        return performRequest(curl, obj, method, url, body, accept, contentType, callback, errCallback)
+    finally:
+        pool.put(key, curl)
+
+def performRequest(curl, obj, method, url, body, accept, contentType, callback, errCallback):
+    finish = prepareRequest(curl, obj, method, url, body, accept, contentType, callback, errCallback)
+    try:
+        curl.perform()
+    except pycurl.error, error:
+        reportRequest(curl, method, url, error)
+        raise
+    reportRequest(curl, method, url)
+    return finish()
 
+def prepareRequest(curl, obj, method, url, body, accept, contentType, callback, errCallback):
+    """Set up a handle for a request without performing it. Returns a
+    function to call once the transfer is done, which produces the
+    (status, body) pair, or, for callback requests, checks the
+    status."""
     # Uncomment these 5 lines to see pycurl debug output
     ## def report(debug_type, debug_msg):
     ##     if debug_type != 3:
@@ -107,17 +578,27 @@ def makeRequest(obj, method, url, body=None, accept="*/*", contentType=None, cal
     if obj.user is not None and obj.password is not None:
         curl.setopt(pycurl.USERPWD, "%s:%s" % (obj.user, obj.password))
         curl.setopt(pycurl.HTTPAUTH, pycurl.HTTPAUTH_BASIC)
-    if not url.startswith("http:"): url = obj.url + url
 
     postbody = method == "POST" or method == "PUT"
+    compressed = postbody and compressBody(obj, body, contentType)
+    if compressed: body = compressed
+    streambody = postbody and isStreamBody(body)
+    curl.setopt(pycurl.UPLOAD, 0)
     curl.setopt(pycurl.POSTFIELDS, "")
-    if body:
+    if body and not streambody:
         if postbody:
             curl.setopt(pycurl.POSTFIELDS, body)
         else:
             url = url + "?" + body
 
     curl.setopt(pycurl.POST, (postbody and 1) or 0)
+    if streambody:
+        # UPLOAD makes curl take the body from the read function. The
+        # size is not known in advance, so it will be sent chunked.
+        # CUSTOMREQUEST below restores the intended method.
+        curl.setopt(pycurl.UPLOAD, 1)
+        curl.setopt(pycurl.INFILESIZE, -1)
+        curl.setopt(pycurl.READFUNCTION, makeReadFunction(body))
     curl.setopt(pycurl.CUSTOMREQUEST, method)
     curl.setopt(pycurl.URL, url)
 
@@ -125,8 +606,9 @@ def makeRequest(obj, method, url, body=None, accept="*/*", contentType=None, cal
     # behaviour that is the default in libcurl when posting large
     # bodies.
     headers = ["Connection: keep-alive", "Accept: " + accept, "Expect:"]
-    if callback: headers.append("Connection: close")
     if contentType and postbody: headers.append("Content-Type: " + contentType)
+    if streambody: headers.append("Transfer-Encoding: chunked")
+    if compressed: headers.append("Content-Encoding: gzip")
     curl.setopt(pycurl.HTTPHEADER, headers)
     curl.setopt(pycurl.ENCODING, "") # which means 'any encoding that curl supports'
 
@@ -138,89 +620,338 @@ def makeRequest(obj, method, url, body=None, accept="*/*", contentType=None, cal
                 status[0] = locale.atoi(string.split(" ")[1])
             return len(string)
         def writefunc(string):
-            if status[0] == 200: callback(string)
+            if status[0] == 200:
+                # Returning 0 makes curl abort the transfer.
+                try: callback(string)
+                except AbortRequest: return 0
             else: error.append(string.decode("utf-8"))
         curl.setopt(pycurl.WRITEFUNCTION, writefunc)
         curl.setopt(pycurl.HEADERFUNCTION, headerfunc)
-        curl.perform()
-        if status[0] != 200:
-            errCallback(curl.getinfo(pycurl.RESPONSE_CODE), "".join(error))
+        def finish():
+            if status[0] != 200:
+                errCallback(curl.getinfo(pycurl.RESPONSE_CODE), "".join(error))
     else:
         buf = StringIO.StringIO()
         curl.setopt(pycurl.WRITEFUNCTION, buf.write)
-        curl.perform()
-        response = buf.getvalue().decode("utf-8")
-        buf.close()
-        result = (curl.getinfo(pycurl.RESPONSE_CODE), response)
-        Pool.instance().put(curl)
-        return result
+        curl.setopt(pycurl.HEADERFUNCTION, ignoreHeader)
+        def finish():
+            response = buf.getvalue().decode("utf-8")
+            buf.close()
+            return (curl.getinfo(pycurl.RESPONSE_CODE), response)
+    return finish
+
+def ignoreHeader(string):
+    return len(string)
 
 def jsonRequest(obj, method, url, body=None, contentType="application/x-www-form-urlencoded", rowreader=None, accept="application/json"):
+    """Perform a request and decode its JSON response. When obj has an
+    executor, the request is submitted to it, and a Future is
+    returned instead."""
+    executor = getattr(obj, "executor", None)
+    if executor is not None:
+        return executor.jsonRequest(obj, method, url, body, contentType, rowreader, accept)
     if rowreader is None:
         status, body = makeRequest(obj, method, url, body, accept, contentType)
-        if (status == 200):
-            if accept in ('application/json', 'text/integer', "application/x-quints+json"):
-                body = cjson.decode(body)
-            return body
-        else: raise RequestError(status, body)
+        return jsonResult(status, body, accept)
     else:
-        def raiseErr(status, message): raise RequestError(status, message)
-        makeRequest(obj, method, url, body, accept, contentType, callback=rowreader.process, errCallback=raiseErr)
+        makeRequest(obj, method, url, body, accept, contentType, callback=rowreader.process, errCallback=raiseRequestError)
 
 def nullRequest(obj, method, url, body=None, contentType="application/x-www-form-urlencoded"):
+    executor = getattr(obj, "executor", None)
+    if executor is not None:
+        return executor.nullRequest(obj, method, url, body, contentType)
     status, body = makeRequest(obj, method, url, body, "application/json", contentType)
+    nullResult(status, body)
+
+def jsonResult(status, body, accept):
+    if (status == 200):
+        if accept in ('application/json', 'text/integer', "application/x-quints+json"):
+            body = cjson.decode(body)
+        return body
+    else: raise RequestError(status, body)
+
+def nullResult(status, body):
     if (status < 200 or status > 204): raise RequestError(status, body)
 
+def raiseRequestError(status, message):
+    raise RequestError(status, message)
+
+def mapResult(obj, value, fn):
+    """Apply fn to the value returned by a request function. When obj
+    has an executor, value is a Future, and a Future for the outcome
+    of fn is returned."""
+    if getattr(obj, "executor", None) is not None:
+        return value.then(fn)
+    return fn(value)
+
+def constantResult(obj, value):
+    """Return value the way a request for obj would: as a completed
+    Future when obj has an executor."""
+    executor = getattr(obj, "executor", None)
+    if executor is not None:
+        return executor.completed(value)
+    return value
+
+def makeRowReader(callback):
+    """A RowReader calling callback, which may also be a RowReader
+    already, or None when there is no callback."""
+    if callback is None or isinstance(callback, RowReader): return callback
+    return RowReader(callback)
+
 class RowReader:
-    def __init__(self, callback):
-        self.hasNames = None
-        self.names = None
-        self.skipNextBracket = False
+    """Incrementally parses a streamed JSON result and calls callback
+    once for each row, passing the row and the variable names (or
+    None when the result is a plain list of rows). Handles both the
+    [[...], ...] and the {"names": [...], "values": [[...], ...]}
+    shapes. Only the text of the row currently being read is kept
+    between chunks, and the work done is linear in the size of the
+    stream, no matter how the rows are split up. namesCallback, if
+    given, is called with the variable names as soon as they are
+    read."""
+
+    # A bracket or brace, or a string, of which the closing quote may
+    # be in a later chunk.
+    TOKEN = re.compile(r'[\[\]{}]|"(?:[^"\\]+|\\.)*(")?')
+    STRING_REST = re.compile(r'(?:[^"\\]+|\\.)*(")?')
+    NEXT_ROW = re.compile(r'\s*,\s*\[')
+
+    def __init__(self, callback, namesCallback=None):
         self.callback = callback
-        self.backlog = None
+        self.namesCallback = namesCallback
+        self.names = None
+        self.pending = []
+        # Scanner state, kept between chunks.
+        self.stack = []
+        self.inString = False
+        self.escaped = False
+        self.key = None
+        # The element (row, names list, or object key) being collected.
+        self.target = None
+        self.depth = None
+        self.parts = []
 
     def process(self, string):
-        if self.hasNames is None:
-            self.hasNames = string[0] == "{"
-            if not self.hasNames: self.skipNextBracket = True
-
-        ln = len(string)
-        if self.backlog: string = self.backlog + string
-        pos = [0]
-
-        def useArray(arr):
-            if self.hasNames:
-                if self.names:
-                    self.callback(arr, self.names)
-                else:
-                    self.names = arr
-                    self.skipNextBracket = True
+        stack = self.stack
+        start = 0
+        pos, end = 0, len(string)
+        while pos < end:
+            if self.inString:
+                if self.escaped:
+                    self.escaped = False
+                    pos += 1
+                    continue
+                match = self.STRING_REST.match(string, pos)
+                closed = match.group(1) is not None
             else:
-                self.callback(arr, None)
-
-        def takeArrayAt(start):
-            scanned = start + 1
-            while True:
-                end = string.find("]", scanned)
-                if end == -1: return False
-                try:
-                    useArray(cjson.decode(string[start : end + 1].decode("utf-8")))
-                    pos[0] = end + 1
-                    return True
-                except cjson.DecodeError:
-                    scanned = end + 1
+                match = self.TOKEN.search(string, pos)
+                if match is None: break
+                pos = match.start()
+                char = string[pos]
+                if char == "[" or char == "{":
+                    if self.target is None and char == "[":
+                        target = None
+                        if stack == ["["]: target = "row"
+                        elif stack == ["{"] and self.key == "names": target = "names"
+                        elif stack == ["{", "["] and self.key == "values": target = "row"
+                        if target == "row":
+                            taken = self._takeFlatRows(string, pos)
+                            if taken != pos:
+                                pos = taken
+                                continue
+                        if target:
+                            self.target, self.depth, start = target, len(stack), pos
+                    stack.append(char)
+                    pos += 1
+                    continue
+                elif char == "]" or char == "}":
+                    stack.pop()
+                    pos += 1
+                    if self.target is not None and len(stack) == self.depth:
+                        self._finish(string, start, pos)
+                    continue
+                if self.target is None and stack == ["{"]:
+                    self.target, start = "key", pos
+                closed = match.group(1) is not None
+                self.inString = True
 
+            pos = match.end()
+            if closed:
+                self.inString = False
+                if self.target == "key": self._finish(string, start, pos)
+            elif pos < end:
+                # A backslash at the very end of the chunk.
+                self.escaped = True
+                pos = end
+
+        if self.target is not None:
+            self.parts.append(string[start:])
+
+    def _finish(self, string, start, end):
+        if self.parts:
+            self.parts.append(string[start:end])
+            text = "".join(self.parts)
+            self.parts = []
+        else:
+            text = string[start:end]
+        target, self.target = self.target, None
+        if target == "key":
+            self.key = cjson.decode(text.decode("utf-8"))
+        elif target == "names":
+            self.names = cjson.decode(text.decode("utf-8"))
+            if self.namesCallback: self.namesCallback(self.names)
+            for row in self.pending: self.callback(row, self.names)
+            self.pending = []
+        else:
+            self._use(text)
+
+    def _takeFlatRows(self, string, pos):
+        """Fast path for the common case of rows that contain no
+        nested arrays and no ']' inside strings. Because pos is at the
+        start of a row, the text up to the first ']' only decodes when
+        it is the whole row. Stops at the first row that does not fit,
+        leaving it to the scanner."""
+        if self.names is None and self.stack[0] == "{":
+            return pos
+        callback, names, decode = self.callback, self.names, cjson.decode
         while True:
-            start = string.find("[", pos[0])
-            if self.skipNextBracket:
-                self.skipNextBracket = False
-                pos[0] = start + 1
-            elif start == -1 or not takeArrayAt(start):
-                break
-
-        if pos[0] == 0:
-            self.backlog = string
-            return ln
+            end = string.find("]", pos) + 1
+            if end == 0: return pos
+            try: row = decode(string[pos:end].decode("utf-8"))
+            except cjson.DecodeError: return pos
+            callback(row, names)
+            match = self.NEXT_ROW.match(string, end)
+            if match is None: return end
+            pos = match.end() - 1
+
+    def _use(self, text):
+        value = cjson.decode(text.decode("utf-8"))
+        if self.stack[0] == "[":
+            self.callback(value, None)
+        elif self.names is None:
+            self.pending.append(value)
+        else:
+            self.callback(value, self.names)
+
+class RowProducer(object):
+    """The side of a RowStream that its request thread uses. It holds
+    no reference to the stream, so that a stream that is dropped
+    without being closed can still be collected, and close itself."""
+    END = object()
+
+    def __init__(self, bufferSize):
+        self.queue = Queue.Queue(bufferSize)
+        self.names = None
+        self.namesKnown = Event()
+        self.error = None
+        self.closed = False
+
+    def run(self, request):
+        try:
+            request(RowReader(self._row, self._setNames))
+        except Exception:
+            if not self.closed: self.error = sys.exc_info()
+        self.namesKnown.set()
+        self.offer(RowProducer.END)
+
+    def _setNames(self, names):
+        self.names = names
+        self.namesKnown.set()
+
+    def _row(self, row, names):
+        if not self.offer(row): raise AbortRequest()
+
+    def offer(self, row):
+        # Blocks while the queue is full, but not past a close().
+        while not self.closed:
+            try:
+                self.queue.put(row, True, 0.5)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def close(self):
+        # The request thread notices within half a second, aborts the
+        # transfer and returns its curl handle to the pool.
+        self.closed = True
+        try:
+            while True: self.queue.get_nowait()
+        except Queue.Empty:
+            pass
+
+class RowStream(object):
+    """Runs a streaming request in a thread of its own and hands out
+    its rows, as an iterator, while they arrive. request is called
+    with a RowReader and must perform the request with it.
+
+    At most bufferSize rows are queued. When the consumer falls
+    behind, the request thread blocks, so curl stops reading from the
+    socket and TCP holds back the server. close() aborts the transfer
+    and drops the queued rows; a stream that is garbage collected
+    before it was read to the end is closed too."""
+    bufferSize = 1000
+
+    def __init__(self, request, bufferSize=None):
+        self.producer = RowProducer(bufferSize or self.bufferSize)
+        self.finished = False
+        # Rows taken from the queue by __len__ but not handed out yet.
+        self.pending = collections.deque()
+        self.count = 0
+        thread = Thread(target=self.producer.run, args=(request,))
+        thread.setDaemon(True)
+        thread.start()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.producer.closed
+
+    def _take(self):
+        producer = self.producer
+        row = producer.queue.get()
+        if row is RowProducer.END:
+            self.finished = True
+            if producer.error:
+                error, producer.error = producer.error, None
+                raise error[0], error[1], error[2]
+            raise StopIteration
+        return row
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.pending:
+            row = self.pending.popleft()
+        elif self.finished or self.closed:
+            raise StopIteration
         else:
-            self.backlog = None
-            return pos[0]
+            row = self._take()
+        self.count += 1
+        return row
+
+    def getNames(self):
+        """Wait for the variable names of the result. Returns None when
+        it has none, and raises the error of the request if it failed
+        before they were read."""
+        producer = self.producer
+        producer.namesKnown.wait()
+        if producer.names is None and producer.error:
+            error, producer.error = producer.error, None
+            raise error[0], error[1], error[2]
+        return producer.names
+
+    def __len__(self):
+        """The total number of rows. This reads all remaining rows into
+        memory."""
+        while not self.finished and not self.closed:
+            try: self.pending.append(self._take())
+            except StopIteration: break
+        return self.count + len(self.pending)
+
+    def close(self):
+        if self.closed: return
+        self.pending.clear()
+        self.producer.close()
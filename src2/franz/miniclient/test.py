@@ -6,11 +6,12 @@
 # http://www.eclipse.org/legal/epl-v10.html
 ###############################################################################
 
-import repository, re
+import repository, re, os, tempfile, time, cjson, io
 from os import environ
-from request import RequestError
+from request import RequestError, RowReader, RowStream, makeReadFunction, compressBody, threadedChunks, Pool, PoolExhaustedError, RequestMetrics, addRequestListener, removeRequestListener, pathTemplate
+from executor import Executor
 
-from nose.tools import with_setup, eq_ as eq
+from nose.tools import with_setup, eq_ as eq, assert_raises
 
 url = "http://%s:%d" % (environ.get('AGRAPH_HOST', 'localhost'),
                         int(environ.get('AGRAPH_PORT', '10035')))
@@ -127,3 +128,226 @@ def testFreeText():
     eq(len(rep.evalFreeTextSearch("rhubarb")), 1)
     rep.deleteFreeTextIndex("index")
     eq(rep.listFreeTextIndices(), [])
+
+@with_setup(cleanup)
+def testStreamingBody():
+    def lines():
+        for x in range(0, 100):
+            yield u"<http:s%d> <http:p> \"%d\" .\n" % (x, x)
+    rep.loadData(lines(), "ntriples")
+    eq(100, rep.getSize())
+    path = tempfile.mktemp(".nt")
+    f = open(path, "w")
+    try:
+        for line in lines(): f.write(line.replace("<http:s", "<http:t"))
+        f.close()
+        rep.loadFile(path, "ntriples")
+    finally:
+        os.remove(path)
+    eq(200, rep.getSize())
+
+def testRowReader():
+    rows = [["<a>", "\"]\""], ["<b>", ["\"nested\"", "\"[x]\""]], ["_:c", "\"\\\\\""]]
+    names = ["x", "y"]
+    for doc in [cjson.encode(rows), '{"names":%s,"values":%s}' % (cjson.encode(names), cjson.encode(rows))]:
+        for size in range(1, 12):
+            result = []
+            reader = RowReader(lambda row, names: result.append((row, names)))
+            for pos in range(0, len(doc), size):
+                reader.process(doc[pos:pos + size])
+            eq(rows, [row for row, _ in result])
+            eq(doc[0] == "{" and names or None, result[0][1])
+
+def testReadFunction():
+    text = u"\xe9" * 100 + u"abc"
+    for body in [io.StringIO(text), [text[:7], text[7:]]]:
+        read = makeReadFunction(body)
+        data = []
+        while True:
+            chunk = read(10)
+            if not chunk: break
+            assert len(chunk) <= 10
+            data.append(chunk)
+        eq(text.encode("utf-8"), "".join(data))
+
+def testThreadedChunksStop():
+    produced = []
+    def chunks():
+        for i in xrange(1000):
+            produced.append(i)
+            yield "x" * 10
+    data = threadedChunks(chunks(), 2)
+    data.next()
+    data.close()
+    time.sleep(1)
+    count = len(produced)
+    time.sleep(1)
+    assert count < 10
+    eq(count, len(produced))
+
+def testAbandonedRowStream():
+    produced = []
+    def request(reader):
+        for i in xrange(100000):
+            produced.append(i)
+            reader.callback([i], None)
+    stream = RowStream(request, 10)
+    eq([0], stream.next())
+    del stream
+    time.sleep(1)
+    count = len(produced)
+    time.sleep(1)
+    assert count < 100
+    eq(count, len(produced))
+
+@with_setup(cleanup)
+def testStreamingReusesConnections():
+    rep.addStatement("<a>", "<p>", '"a"')
+    rows = []
+    rep.getStatements(callback=lambda row, names: rows.append(row))
+    before = Pool.instance().stats(rep.url)
+    for x in range(0, 20):
+        rep.getStatements(callback=lambda row, names: rows.append(row))
+        rep.evalSparqlQuery("select ?x {?x ?y ?z}", callback=lambda row, names: rows.append(row))
+    after = Pool.instance().stats(rep.url)
+    eq(41, len(rows))
+    eq(40, after["requests"] - before["requests"])
+    assert after["connects"] - before["connects"] <= 1
+
+def testPoolLimits():
+    class Handle:
+        closed = False
+        def getinfo(self, info): return 0
+        def close(self): self.closed = True
+    pool = Pool(Handle, os.getpid())
+    try:
+        Pool.configure(maxSize=2, idleTimeout=60, block=False)
+        a, b = pool.get("http://a:80"), pool.get("http://a:80")
+        assert_raises(PoolExhaustedError, pool.get, "http://a:80")
+        c = pool.get("http://b:80")
+        pool.put("http://a:80", a)
+        eq(a, pool.get("http://a:80"))
+        Pool.configure(maxSize=2, timeout=0.1)
+        assert_raises(PoolExhaustedError, pool.get, "http://a:80")
+        pool.put("http://a:80", a)
+        pool.put("http://a:80", b)
+        Pool.configure(idleTimeout=-1)
+        pool.put("http://b:80", c)
+        assert a.closed and b.closed and c.closed
+        stats = pool.stats("http://a")
+        eq((1, 4, 2, 2, 1, 1, 0), tuple(stats[name] for name in
+            ("hits", "misses", "creates", "evicts", "waits", "timeouts", "size")))
+        eq(3, pool.stats()["creates"])
+    finally:
+        Pool.configure()
+
+def testPoolStats():
+    pool = Pool(object, os.getpid())
+    eq(0, pool.stats()["requests"])
+    eq(0, pool.stats("http://a")["size"])
+    ## Reading the counters of a server does not create them
+    eq({}, pool.counters)
+
+@with_setup(cleanup)
+def testExecutor():
+    rep.addStatements([["<http://a%d>" % i, "<http://p>", '"%d"' % i, None] for i in range(20)])
+    executor = Executor(maxConcurrent=4)
+    view = rep.withExecutor(executor)
+    futures = [view.getStatements(subj="<http://a%d>" % i) for i in range(20)]
+    size, missing = view.getSize(), view.getStatements(subj=[])
+    assert not futures[0].done()
+    executor.run()
+    for i, future in enumerate(futures):
+        eq([['<http://a%d>' % i, '<http://p>', '"%d"' % i]], [row[:3] for row in future.result()])
+    eq(20, size.result())
+    eq([], missing.result())
+    error = view.evalSparqlQuery("not sparql")
+    assert_raises(RequestError, error.result)
+    eq(20, rep.getSize())
+
+@with_setup(cleanup)
+def testEvalSparqlQueryMany():
+    rep.addStatements([["<http://a%d>" % i, "<http://p>", '"%d"' % i, None] for i in range(50)])
+    sets = ({"o": '"%d"' % i} for i in range(50))
+    results = dict(rep.evalSparqlQueryMany("select ?s {?s <http://p> ?o}", sets, maxConcurrent=4))
+    eq(range(50), sorted(results))
+    for i in range(50):
+        eq([["<http://a%d>" % i]], results[i]["values"])
+
+@with_setup(cleanup)
+def testEvalSparqlQueryManyClose():
+    rep.addStatements([["<http://a%d>" % i, "<http://p>", '"%d"' % i, None] for i in range(50)])
+    records = []
+    addRequestListener(records.append)
+    try:
+        results = rep.evalSparqlQueryMany("select ?s {?s <http://p> ?o}",
+                                          ({"o": '"%d"' % i} for i in range(50)), maxConcurrent=2)
+        results.next()
+        results.close()
+        performed = len(records)
+        assert performed <= 2
+        eq(50, rep.getSize())
+        eq(performed + 1, len(records))
+    finally:
+        removeRequestListener(records.append)
+    assert_raises(RequestError, lambda: list(rep.evalSparqlQueryMany("not sparql", [{}] * 20)))
+    eq(50, rep.getSize())
+
+@with_setup(cleanup)
+def testAsyncRepository():
+    arep = repository.AsyncClient(url, "test", "xyzzy").openCatalogByName("tests").getRepository("foo")
+    arep.openSession().result()
+    try:
+        futures = [arep.addStatement("<http://a%d>" % i, "<http://p>", '"%d"' % i) for i in range(10)]
+        size = arep.getSize()
+        eq(10, size.result())
+        eq(0, rep.getSize())
+        arep.commit().result()
+    finally:
+        arep.closeSession().result()
+    eq(10, rep.getSize())
+    eq(10, len(list(arep.iterStatements(pred="<http://p>"))))
+    rows = list(arep.iterSparqlQuery("select ?s { ?s <http://p> \"3\" }"))
+    eq([["<http://a3>"]], rows)
+
+@with_setup(cleanup)
+def testCompressedBodies():
+    rep.setRequestCompression(level=6, threshold=0)
+    try:
+        rep.addStatements([["<http://example.org/s%d>" % i, "<http://example.org/p>", '"%d"' % i, None]
+                           for i in range(1000)])
+        rep.loadData("".join(["<http://example.org/t%d> <http://example.org/p> \"%d\" .\n" % (i, i)
+                              for i in range(1000)]), "ntriples")
+        rep.loadData(("<http://example.org/u%d> <http://example.org/p> \"%d\" .\n" % (i, i)
+                      for i in range(1000)), "ntriples")
+        eq(3000, rep.getSize())
+        ## Only data is compressed, not form encoded parameters
+        assert compressBody(rep, "x" * 100, "text/plain")
+        eq(None, compressBody(rep, "query=" + "x" * 100, None))
+        eq(3000, len(rep.evalSparqlQuery("select ?s {?s ?p ?o}")["values"]))
+    finally:
+        rep.setRequestCompression(level=None)
+
+@with_setup(cleanup)
+def testRequestMetrics():
+    metrics, records = RequestMetrics(), []
+    addRequestListener(metrics)
+    addRequestListener(records.append)
+    try:
+        rep.addStatement("<a>", "<p>", '"a"')
+        for i in range(5): rep.getSize()
+        assert_raises(RequestError, rep.evalSparqlQuery, "not sparql")
+    finally:
+        removeRequestListener(metrics)
+        removeRequestListener(records.append)
+    eq(7, len(records))
+    eq(("POST", "/catalogs/{catalog}/repositories/{repository}/statements", 204),
+       (records[0].method, records[0].path, records[0].status))
+    assert records[0].uploaded > 0
+    size = metrics.get("GET", "/catalogs/{catalog}/repositories/{repository}/size")
+    eq(5, size.count)
+    eq(5, sum(size.totalHistogram.values()))
+    assert 0 < size.starttransfer <= size.total
+    eq(1, metrics.get("GET", "/catalogs/{catalog}/repositories/{repository}").errors)
+    eq("/catalogs/{catalog}/repositories/{repository}/namespaces/{prefix}",
+       pathTemplate(url + "/catalogs/tests/repositories/foo/namespaces/rdf?x=1"))
@@ -67,7 +67,8 @@ class Literal(Value):
     """
     Implementation of the Literal class.
     """
-    
+    __slots__ = ('_label', '_datatype', '_language', '_ntriples')
+
     def __init__(self, label, datatype=None, language=None):
         Value.__init__(self)
         
@@ -92,6 +93,7 @@ class Literal(Value):
                 datatype = None
 
         self._datatype = datatype # pylint: disable-msg=W0201
+        self._ntriples = None
 
     datatype = property(getDatatype, setDatatype)
 
@@ -102,6 +104,7 @@ class Literal(Value):
     def setLanguage(self, language):
         """Set the language for this Literal"""
         self._language = language.lower() if language else None # pylint: disable-msg=W0201
+        self._ntriples = None
 
     language = property(getLanguage, setLanguage)
 
@@ -112,6 +115,7 @@ class Literal(Value):
     def setLabel(self, label):
         """Set the label for this Literal"""
         self._label = label # pylint: disable-msg=W0201
+        self._ntriples = None
     
     def getValue(self):
         """The label/value"""
@@ -120,12 +124,13 @@ class Literal(Value):
     label = property(getLabel, setLabel)
     
     def __eq__(self, other):
+        if self is other: return True
         if not isinstance(other, Literal):
             return NotImplemented
 
-        return (self.label == other.label and 
-                self.datatype == other.datatype and
-                self.language == other.language)
+        return (self._label == other._label and
+                self._language == other._language and
+                self._datatype == other._datatype)
     
     def __hash__(self):
         return hash(self._label)
@@ -177,6 +182,8 @@ class Literal(Value):
         """
         Return an NTriples representation for this Literal.
         """
+        if self._ntriples is not None:
+            return self._ntriples
         sb = []
         sb.append('"')
         sb.append(strings.encode_ntriple_string(self.getLabel()))
@@ -187,7 +194,8 @@ class Literal(Value):
         if self.datatype:
             sb.append("^^")
             sb.append(self.datatype.toNTriples())
-        return ''.join(sb)
+        self._ntriples = ''.join(sb)
+        return self._ntriples
 
 
 ###############################################################################
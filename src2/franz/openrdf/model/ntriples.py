@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+from __future__ import absolute_import
+
+"""
+Parsing of the NTRIPLES terms the server sends in results.
+"""
+
+from .value import URI, BNode
+from .literal import Literal
+from ..util.strings import decode_ntriple_string
+from ..vocabulary.xmlschema import XMLSchema
+
+import weakref
+
+## URIs and blank nodes are interned: while one is in use, parsing the
+## same string again returns the same object, so a result with a few
+## distinct predicates holds a few URI objects, and comparing equal
+## terms mostly finds them identical.  The table holds weak references,
+## and at most INTERN_SIZE of them; terms parsed while it is full are
+## not shared.  The CACHE_SIZE terms parsed last are also kept alive, so
+## that terms that come back row after row are not parsed again.  The
+## cache is emptied when it is full, which is cheaper than tracking use.
+## Terms longer than CACHE_MAX_LENGTH are neither cached nor interned.
+## Literals are never shared, since they have setters.
+INTERN_SIZE = 1000000
+CACHE_SIZE = 10000
+CACHE_MAX_LENGTH = 256
+
+_interned = weakref.WeakValueDictionary()
+_cache = {}
+
+def parse_term(string):
+    """
+    Return the URI, Literal or BNode for 'string', a term in NTRIPLES
+    format.  Strings that are not NTRIPLES terms become plain literals,
+    and empty strings and None are returned as they are.
+
+    Terms are parsed in one pass that looks at the first character, and
+    escape sequences are only decoded when there is a backslash.  Equal
+    strings mostly give the same, interned URI or BNode; don't modify
+    the terms returned.  Every call returns a new Literal.
+    """
+    if not string:
+        return string
+    if string[0] not in '<_':
+        return _parse(string)
+    term = _cache.get(string)
+    if term is None:
+        term = _interned.get(string)
+        if term is None:
+            term = _parse(string)
+            if len(string) > CACHE_MAX_LENGTH or isinstance(term, Literal):
+                return term
+            if len(_interned) < INTERN_SIZE:
+                _interned[string] = term
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[string] = term
+    return term
+
+def term_hash(string):
+    """
+    The hash of the term parse_term returns for 'string'.  Common terms
+    without escapes are hashed without being parsed.
+    """
+    if not string:
+        return hash(string)
+    term = _cache.get(string)
+    if term is not None:
+        return hash(term)
+    if '\\' not in string:
+        ## See the __hash__ of URI, BNode and Literal
+        first = string[0]
+        if first == '<':
+            if string[-1] == '>':
+                return hash(string[1:-1])
+        elif first == '"':
+            end = string.rfind('"')
+            if end > 0 and (end == len(string) - 1 or string[end + 1] == '@'):
+                return hash(string[1:end])
+        elif first != '_':
+            return hash(string)
+    return hash(parse_term(string))
+
+def clear_cache():
+    """
+    Drop the cached and interned terms.  Terms in use stay valid, but
+    are no longer shared with terms parsed later.
+    """
+    _cache.clear()
+    _interned.clear()
+
+def interned_count():
+    """
+    The number of interned terms that are still in use.
+    """
+    return len(_interned)
+
+def _parse(string):
+    first = string[0]
+    if first == '<':
+        if string[-1] == '>':
+            return URI(decode_ntriple_string(string[1:-1]))
+    elif first == '"':
+        ## Language tags and datatype URIs contain no quotes
+        end = string.rfind('"')
+        if end > 0:
+            label = decode_ntriple_string(string[1:end])
+            if end == len(string) - 1:
+                return Literal(label)
+            mark = string[end + 1]
+            if mark == '@':
+                return Literal(label, language=string[end + 2:])
+            if mark == '^' and string.startswith('^<', end + 2) and string[-1] == '>':
+                datatype = string[end + 3:]
+                return Literal(label, datatype=XMLSchema.uristr2obj.get(datatype) or
+                               URI(decode_ntriple_string(datatype[1:-1])))
+    elif first == '_':
+        if string.startswith(':', 1) and len(string) > 2:
+            return BNode(string[2:])
+    return Literal(string)
@@ -14,12 +14,14 @@ from __future__ import absolute_import
 
 from .value import Value, URI, BNode
 from .literal import Literal
-from ..util import strings
+from .ntriples import parse_term, term_hash
 
-class Statement:
+class Statement(object):
     """
     Lightweight implementation of 'Statement'
     """
+    __slots__ = ('subject', 'predicate', 'object', 'context', 'string_tuple')
+
     def __init__(self, subject, predicate, object, context=None):
         self.subject = subject
         self.predicate = predicate
@@ -30,21 +32,49 @@ class Statement:
     def __eq__(self, other):
         if not isinstance(other, Statement):
             return NotImplemented
+        if self is other:
+            return True
 
-        ## The object is potentially the cheapest to check, as types
-        ## of these references might be different.
-        ## In general the number of different predicates in sets of
-        ## statements is the smallest, so predicate equality is checked
-        ## last.
-        spoEqual = self.getObject() == other.getObject() and self.getSubject() == other.getSubject() \
-                and self.getPredicate() == other.getPredicate()
+        mine, theirs = self.string_tuple, other.string_tuple
+        if (mine is not None and theirs is not None and
+            self.subject is None and self.predicate is None and self.object is None and
+            other.subject is None and other.predicate is None and other.object is None and
+            mine[2] == theirs[2] and mine[0] == theirs[0] and mine[1] == theirs[1]):
+            ## Equal strings are equal terms, so nothing needs parsing.
+            ## Different strings may still spell equal terms, though.
+            spoEqual = True
+        else:
+            ## The object is potentially the cheapest to check, as types
+            ## of these references might be different.
+            ## In general the number of different predicates in sets of
+            ## statements is the smallest, so predicate equality is checked
+            ## last.
+            spoEqual = self.getObject() == other.getObject() and self.getSubject() == other.getSubject() \
+                    and self.getPredicate() == other.getPredicate()
         if self.context:
             return spoEqual and self.getContext() == other.getContext()
         else:
             return spoEqual
 
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __getstate__(self):
+        return (self.subject, self.predicate, self.object, self.context, self.string_tuple)
+
+    def __setstate__(self, state):
+        self.subject, self.predicate, self.object, self.context, self.string_tuple = state
+
     def __hash__(self):
-        return 961 * self.getSubject().__hash__() + 31 * self.getPredicate().__hash__() + self.getObject().__hash__();
+        ## Terms not parsed yet are hashed from their strings
+        strings = self.string_tuple
+        subject, predicate, object = self.subject, self.predicate, self.object
+        if strings is None:
+            return 961 * hash(subject) + 31 * hash(predicate) + hash(object)
+        return (961 * (hash(subject) if subject is not None else term_hash(strings[0])) +
+                31 * (hash(predicate) if predicate is not None else term_hash(strings[1])) +
+                (hash(object) if object is not None else term_hash(strings[2])))
 
     def __str__(self):
         sb= []
@@ -124,21 +154,6 @@ class Statement:
     def stringTermToTerm(string_term):
         """
         Given a string representing a term in ntriples format, return
-        a URI, Literal, or BNode.
+        a URI, Literal, or BNode (see ntriples.parse_term).
         """
-        if not string_term:
-            return string_term
-        
-        parsed = strings.uriref(string_term)
-        if parsed:
-            return URI(parsed)
-
-        parsed = strings.literal(string_term)
-        if parsed:
-            return Literal(*parsed)
-
-        parsed = strings.nodeid(string_term)
-        if parsed:
-            return BNode(parsed)
-
-        return Literal(string_term)
+        return parse_term(string_term)
@@ -19,13 +19,34 @@ class Value(object):
     """
     Top class in the org.openrdf.model interfaces.
     """
-    
+    ## Terms keep their fields in slots rather than a dictionary, which
+    ## matters for results with millions of them.  Subclasses that don't
+    ## declare slots get a dictionary as usual.
+    __slots__ = ('__weakref__',)
+
+    def __getstate__(self):
+        ## Needed to pickle slotted objects with protocols 0 and 1
+        state = dict(getattr(self, '__dict__', ()))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name != '__weakref__' and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
     def __str__(self):
         return self.toNTriples()
 
     def __eq__(self, other):
         return NotImplemented
 
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
     # Default to not-hashable
     __hash__ = None
 
@@ -37,12 +58,14 @@ class Value(object):
     
     
 class Resource(Value):
-    pass
+    __slots__ = ()
 
 class URI(Resource):
     """
     Lightweight implementation of the class 'URI'.
     """
+    __slots__ = ('_uri', '_ntriples')
+
     def __init__(self, uri=None, namespace=None, localname=None):
         if uri and not isinstance(uri, basestring):
             raise IllegalArgumentException("Object of type %s passed to URI constructor where string expected: %s"
@@ -55,12 +78,18 @@ class URI(Resource):
             uri = namespace + localname
 
         self._uri = uri
+        self._ntriples = None
     
     def __eq__(self, other):
+        ## Interned terms (see ntriples.parse_term) are mostly identical
+        if self is other: return True
+        if isinstance(other, URI): return self.getURI() == other.getURI()
+        if isinstance(other, Value): return False
+        ## A URI is also equal to its NTRIPLES string
         return str(self) == str(other)
 
     def __hash__(self):
-        return hash(self.uri)
+        return hash(self.getURI())
     
     def getURI(self):
         """
@@ -94,11 +123,16 @@ class URI(Resource):
         Return an NTriples representation of a resource, in this case, wrap
         it in angle brackets.
         """
-        return "<%s>" % strings.encode_ntriple_string(self.uri)
+        ntriples = self._ntriples
+        if ntriples is None:
+            ntriples = self._ntriples = "<%s>" % strings.encode_ntriple_string(self.uri)
+        return ntriples
     
 class BNode(Resource):
     """
     """
+    __slots__ = ('id',)
+
     def __init__(self, id=None):
         self.id = id
         
@@ -111,7 +145,8 @@ class BNode(Resource):
     getValue = getID
     
     def __eq__(self, other):
-        return isinstance(other, BNode) and self.getId() == other.getId()
+        if self is other: return True
+        return isinstance(other, BNode) and self.id == other.id
     
     def __hash__(self):
         return hash(self.id)
@@ -14,8 +14,18 @@ from __future__ import absolute_import
 
 from ..exceptions import IllegalOptionException, QueryMissingFeatureException
 from .dataset import ALL_CONTEXTS, Dataset
-from .queryresult import GraphQueryResult, TupleQueryResult
-import datetime
+from .queryresult import GraphQueryResult, PagedTupleQueryResult, TupleQueryResult
+from franz.miniclient.request import RowStream
+import datetime, re
+
+## Tells a cache miss from a cached None
+_MISSING = object()
+
+## The LIMIT and OFFSET clauses at the end of a SPARQL query
+_TRAILING_MODIFIERS = re.compile(r'(\s+(LIMIT|OFFSET)\s+\d+)+\s*$', re.IGNORECASE)
+
+def _hashable(contexts):
+    return tuple(contexts) if isinstance(contexts, list) else contexts
 
 class QueryLanguage:
     registered_languages = []
@@ -157,10 +167,11 @@ class Query(object):
     def _get_connection(self):
         return self.connection
     
-    def evaluate_generic_query(self, count=False, accept=None):
+    def evaluate_generic_query(self, count=False, accept=None, callback=None):
         """
         Evaluate a SPARQL or PROLOG query, which may be a 'select', 'construct', 'describe'
         or 'ask' query (in the SPARQL case).  Return an appropriate response.
+        If 'callback' is given, it is called with each row instead.
         """
         ##if self.dataset and self.dataset.getDefaultGraphs() and not self.dataset.getDefaultGraphs() == ALL_CONTEXTS:
         ##    raise UnimplementedMethodException("Query datasets not yet implemented for default graphs.")
@@ -175,14 +186,29 @@ class Query(object):
             for vbl, val in self.bindings.items():
                 bindings[vbl] = conn._convert_term_to_mini_term(val)
         mini = conn._get_mini_repository()
+        cache = conn.getQueryCache() if callback is None else None
+        if cache is not None:
+            key = (mini.url, str(self.queryLanguage), self.queryString, self.baseURI,
+                   _hashable(regularContexts), _hashable(namedContexts),
+                   bindings and tuple(sorted(bindings.items())),
+                   self.includeInferred, self.checkVariables, count, accept)
+            group = conn._query_cache_group()
+            generation = cache.generation(group, mini)
+            response = cache.get(group, key, _MISSING, generation)
+            if response is not _MISSING:
+                return response
         if self.queryLanguage == QueryLanguage.SPARQL:  
             response = mini.evalSparqlQuery(self.queryString, context=regularContexts, namedContext=namedContexts, 
                                             infer=self.includeInferred, bindings=bindings,
-                                            checkVariables=self.checkVariables, count=count, accept=accept)
+                                            checkVariables=self.checkVariables, count=count, accept=accept,
+                                            callback=callback)
         elif self.queryLanguage == QueryLanguage.PROLOG:
             if namedContexts:
                 raise QueryMissingFeatureException("Prolog queries do not support the datasets (named graphs) option.")
-            response = mini.evalPrologQuery(self.queryString, infer=self.includeInferred, count=count, accept=accept)
+            response = mini.evalPrologQuery(self.queryString, infer=self.includeInferred, count=count, accept=accept,
+                                            callback=callback)
+        if cache is not None:
+            cache.put(group, key, response, generation)
         return response
 
     @staticmethod
@@ -205,13 +231,22 @@ class TupleQuery(Query):
         super(TupleQuery, self).__init__(queryLanguage, queryString, baseURI=baseURI)
         self.connection = None
         
-    def evaluate(self, count=False):
+    def evaluate(self, count=False, stream=False):
         """
         Execute the embedded query against the RDF store.  Return
         an iterator that produces for each step a tuple of values
         (resources and literals) corresponding to the variables
         or expressions in a 'select' clause (or its equivalent).
+        If 'stream' is True, rows are produced while they arrive from
+        the server, instead of after the whole response is read; close
+        the result to abandon the rest.
         """
+        if stream and not count:
+            # Buffered writes are sent here, not in the stream's thread
+            self._get_connection().flush()
+            rows = RowStream(lambda reader: self.evaluate_generic_query(callback=reader))
+            return TupleQueryResult(rows.getNames(), rows)
+
         response = self.evaluate_generic_query(count=count)
 
         if count:
@@ -219,13 +254,94 @@ class TupleQuery(Query):
         
         return TupleQueryResult(response['names'], response['values'])
 
+    def evaluatePaged(self, pageSize=10000, offset=0, retries=3, prefetch=True):
+        """
+        Evaluate the query a page of 'pageSize' rows at a time, by adding
+        LIMIT and OFFSET clauses to it, starting 'offset' rows into the
+        result.  Returns a PagedTupleQueryResult, which fetches the next page
+        while the current one is read, asks for a failing page again up to
+        'retries' times, and tells with getOffset where to resume.  LIMIT and
+        OFFSET clauses at the end of the query are respected.  The pages only
+        fit together if the order of the rows is the same each time, so give
+        the query an ORDER BY.  SPARQL queries only.
+        """
+        if self.queryLanguage != QueryLanguage.SPARQL:
+            raise QueryMissingFeatureException("Only SPARQL queries can be evaluated in pages.")
+        query, start, limit = self.queryString, 0, None
+        match = _TRAILING_MODIFIERS.search(query)
+        if match:
+            query = query[:match.start()]
+            for keyword, number in re.findall(r'(LIMIT|OFFSET)\s+(\d+)', match.group(0), re.IGNORECASE):
+                if keyword.upper() == 'LIMIT': limit = int(number)
+                else: start = int(number)
+        if limit is not None: limit = max(limit - offset, 0)
+        conn = self._get_connection()
+        namedContexts = conn._contexts_to_ntriple_contexts(
+                        self.dataset.getNamedGraphs() if self.dataset else None)
+        regularContexts = conn._contexts_to_ntriple_contexts(
+                self.dataset.getDefaultGraphs() if self.dataset else ALL_CONTEXTS)
+        bindings = dict((vbl, conn._convert_term_to_mini_term(val)) for vbl, val in self.bindings.items())
+        ## Used from the prefetching thread, so don't go through the connection
+        mini = conn._get_mini_repository()
+
+        def fetch(position, count):
+            return mini.evalSparqlQuery("%s LIMIT %d OFFSET %d" % (query, count, start + position),
+                                        context=regularContexts, namedContext=namedContexts,
+                                        infer=self.includeInferred, bindings=bindings,
+                                        checkVariables=self.checkVariables)
+
+        return PagedTupleQueryResult(fetch, pageSize, offset=offset, limit=limit, retries=retries,
+                                     prefetch=prefetch)
+
+    def evaluateMany(self, bindingSets, parallelism=8):
+        """
+        Evaluate the query once for every dict of bindings in 'bindingSets'
+        (an iterable, read as the evaluation proceeds), with the bindings
+        set on the query as defaults.  Values are converted as by setBinding.
+        Up to 'parallelism' evaluations run at the same time, and
+        (bindings, TupleQueryResult) pairs are produced in the order they
+        complete.  SPARQL queries only.
+        """
+        if self.queryLanguage != QueryLanguage.SPARQL:
+            raise QueryMissingFeatureException("Only SPARQL queries can be evaluated with many binding sets.")
+        return self._evaluate_many(bindingSets, parallelism)
+
+    def _evaluate_many(self, bindingSets, parallelism):
+        conn = self._get_connection()
+        namedContexts = conn._contexts_to_ntriple_contexts(
+                        self.dataset.getNamedGraphs() if self.dataset else None)
+        regularContexts = conn._contexts_to_ntriple_contexts(
+                self.dataset.getDefaultGraphs() if self.dataset else ALL_CONTEXTS)
+        defaults = dict((vbl, conn._convert_term_to_mini_term(val)) for vbl, val in self.bindings.items())
+        originals = {}
+
+        def mini_binding_sets():
+            for index, bindings in enumerate(bindingSets):
+                originals[index] = bindings
+                miniBindings = dict(defaults)
+                for vbl, val in bindings.items():
+                    if isinstance(val, str): val = conn.createLiteral(val)
+                    miniBindings[vbl] = conn._convert_term_to_mini_term(val)
+                yield miniBindings
+
+        mini = conn._get_mini_repository()
+        for index, response in mini.evalSparqlQueryMany(self.queryString, mini_binding_sets(),
+                                                        infer=self.includeInferred, context=regularContexts,
+                                                        namedContext=namedContexts, checkVariables=self.checkVariables,
+                                                        maxConcurrent=parallelism):
+            yield originals.pop(index), TupleQueryResult(response['names'], response['values'])
+
 class GraphQuery(Query):
     
-    def evaluate(self):
+    def evaluate(self, stream=False):
         """
         Execute the embedded query against the RDF store.  Return
-        a graph.
+        a graph.  If 'stream' is True, statements are produced while
+        they arrive from the server.
         """
+        if stream:
+            self._get_connection().flush()
+            return GraphQueryResult(RowStream(lambda reader: self.evaluate_generic_query(callback=reader)))
         response = self.evaluate_generic_query()
         return GraphQueryResult(response)
 
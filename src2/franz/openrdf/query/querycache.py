@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+from __future__ import absolute_import
+from __future__ import with_statement
+
+try:
+    from collections import namedtuple
+except ImportError:
+    from ..util.namedtuple import namedtuple
+
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+import marshal, os, tempfile, threading, time, zlib
+
+def estimate_size(value):
+    """
+    A rough size in bytes of a query response: the lengths of its strings
+    plus a few bytes for every container slot.
+    """
+    if isinstance(value, basestring):
+        return len(value) + 24
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value) + 8 * len(value) + 32
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.iteritems()) + 100
+    return 16
+
+def size_probe(mini_repository):
+    """
+    The default generation probe of a DiskQueryCache: the number of
+    statements in the repository.
+    """
+    return mini_repository.getSize()
+
+QueryCacheStats = namedtuple('QueryCacheStats',
+    'hits misses evictions expirations invalidations entries bytes')
+
+class _Entry(object):
+    __slots__ = ('prev', 'next', 'key', 'value', 'size', 'expires', 'group', 'generation')
+
+class QueryCache(object):
+    """
+    A least-recently-used cache of query responses, holding at most about
+    'maxBytes' bytes (see estimate_size).  Entries older than 'ttl' seconds
+    are not used; None keeps them until they are evicted or invalidated.
+
+    Entries are grouped by repository.  A connection that has the cache
+    (see RepositoryConnection.setQueryCache) drops the group of its
+    repository whenever it adds, removes, clears, commits or rolls back,
+    so the cache can be shared by the connections and sessions of a
+    repository.  Writes made by other clients are only seen once the
+    entries expire.  The cache is thread safe.
+
+    A 'backing' cache, normally a DiskQueryCache, is a second tier: it is
+    asked when this cache misses, and keeps everything this cache does.
+    """
+    def __init__(self, maxBytes=16777216, ttl=None, backing=None):
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.backing = backing
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.clear()
+
+    def clear(self):
+        """
+        Drop every entry and reset the statistics.  The backing cache is
+        left alone.
+        """
+        with self.lock:
+            for group in self.generations:
+                self.generations[group] += 1
+            self.entries = {}
+            self.groups = {}
+            ## The list of entries, most recently used first
+            self.root = root = _Entry()
+            root.prev = root.next = root
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def generation(self, group, mini_repository=None):
+        """
+        A value that changes whenever 'group' is invalidated, or when the
+        generation of the backing cache does.  Get it before a query and
+        pass it to get and put, so that a result that may have missed a
+        write made meanwhile is neither used nor cached.  'mini_repository'
+        is the miniclient repository the query goes to.
+        """
+        generation = self.generations.get(group, 0)
+        if self.backing is not None:
+            return (generation, self.backing.generation(group, mini_repository))
+        return generation
+
+    def get(self, group, key, default=None, generation=None):
+        """
+        The cached response for 'key' in 'group', or 'default'.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires is not None and entry.expires <= time.time():
+                    self._drop(entry)
+                    self.expirations += 1
+                elif generation is not None and entry.generation != generation:
+                    self._drop(entry)
+                else:
+                    self._unlink(entry)
+                    self._link(entry)
+                    self.hits += 1
+                    return entry.value
+            self.misses += 1
+        if self.backing is None:
+            return default
+        value = self.backing.get(group, key, default, self._backing_generation(generation))
+        if value is not default:
+            self._store(group, key, value, generation)
+        return value
+
+    def put(self, group, key, value, generation=None):
+        """
+        Cache 'value' for 'key', in the group of repository URL 'group',
+        unless the group was invalidated since 'generation'.  Values larger
+        than the whole cache are only kept by the backing cache.
+        """
+        if self._store(group, key, value, generation) and self.backing is not None:
+            self.backing.put(group, key, value, self._backing_generation(generation))
+
+    def _backing_generation(self, generation):
+        return generation[1] if generation is not None else None
+
+    def _store(self, group, key, value, generation):
+        size = estimate_size(value)
+        own = generation
+        if self.backing is not None and generation is not None: own = generation[0]
+        with self.lock:
+            if own is not None and own != self.generations.get(group, 0): return False
+            old = self.entries.get(key)
+            if old is not None: self._drop(old)
+            if size > self.maxBytes: return True
+            entry = _Entry()
+            entry.key, entry.value, entry.size, entry.group = key, value, size, group
+            entry.generation = generation
+            entry.expires = time.time() + self.ttl if self.ttl is not None else None
+            self.entries[key] = entry
+            self.groups.setdefault(group, set()).add(key)
+            self._link(entry)
+            self.bytes += size
+            while self.bytes > self.maxBytes:
+                self._drop(self.root.prev)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, group=None):
+        """
+        Drop the entries of repository URL 'group', or all of them, here
+        and in the backing cache.
+        """
+        with self.lock:
+            if group is None:
+                entries = self.entries.values()
+                groups = set(self.generations) | set(self.groups)
+            else:
+                entries = [self.entries[key] for key in self.groups.get(group, ())]
+                groups = [group]
+            for name in groups:
+                self.generations[name] = self.generations.get(name, 0) + 1
+            for entry in entries:
+                self._drop(entry)
+            self.invalidations += 1
+        if self.backing is not None:
+            self.backing.invalidate(group)
+
+    def getStats(self):
+        """
+        A QueryCacheStats with the counts since the cache was created or cleared.
+        """
+        with self.lock:
+            return QueryCacheStats(self.hits, self.misses, self.evictions, self.expirations,
+                                   self.invalidations, len(self.entries), self.bytes)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _link(self, entry):
+        root = self.root
+        entry.prev, entry.next = root, root.next
+        root.next.prev = entry
+        root.next = entry
+
+    def _unlink(self, entry):
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+
+    def _drop(self, entry):
+        self._unlink(entry)
+        del self.entries[entry.key]
+        keys = self.groups[entry.group]
+        keys.discard(entry.key)
+        if not keys: del self.groups[entry.group]
+        self.bytes -= entry.size
+
+class DiskQueryCache(object):
+    """
+    A cache of query responses in 'directory', which outlives the process
+    and can be shared by several processes.  Each response is a file of
+    marshalled, zlib compressed data; when the files take more than
+    'maxBytes' bytes, the least recently used ones are removed.  Entries
+    older than 'ttl' seconds are not used.
+
+    Use it on its own with RepositoryConnection.setQueryCache, or as the
+    backing of a QueryCache.  Writes through a connection that has the
+    cache invalidate its repository: a generation number, kept in a file
+    per repository, is part of the file names, and is incremented.  Files
+    of older generations are no longer found, and are removed when they
+    are evicted, or by clear().  To notice the writes of
+    other clients and processes, 'probe' is called with the miniclient
+    repository at most every 'probeInterval' seconds, and entries made
+    while it returned something else are not used.  The default probe,
+    size_probe, asks for the number of statements; a cheaper or more
+    precise change marker can be plugged in, and None turns probing off.
+    """
+    SUFFIX = '.qc'
+    GENERATION = 'generation'
+
+    def __init__(self, directory, maxBytes=268435456, ttl=None, probe=size_probe, probeInterval=10.0):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.probe = probe
+        self.probeInterval = probeInterval
+        self.lock = threading.Lock()
+        self.markers = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        ## File name -> [size, last use] of the files this process knows about
+        self.files = {}
+        for name in os.listdir(directory):
+            if name.endswith(self.SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                self.files[name] = [stat.st_size, stat.st_mtime]
+        self.bytes = sum(size for size, used in self.files.itervalues())
+
+    def generation(self, group, mini_repository=None):
+        """
+        The value of the probe for 'group', asked again once it is
+        'probeInterval' seconds old, or None without a probe.
+        """
+        if self.probe is None or mini_repository is None: return None
+        now = time.time()
+        with self.lock:
+            marker = self.markers.get(group)
+            if marker is not None and now - marker[1] < self.probeInterval:
+                return marker[0]
+        value = self.probe(mini_repository)
+        with self.lock:
+            self.markers[group] = (value, now)
+        return value
+
+    def get(self, group, key, default=None, generation=None):
+        """
+        The cached response for 'key' in 'group', or 'default'.
+        """
+        name = self._file_name(group, key, self._read_generation(group))
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                storedKey, created, storedGeneration, value = marshal.loads(zlib.decompress(f.read()))
+        except (IOError, OSError, EOFError, ValueError, TypeError, zlib.error):
+            ## Missing, or not written completely
+            with self.lock:
+                self.misses += 1
+            return default
+        now = time.time()
+        with self.lock:
+            if storedKey != repr(key) or (generation is not None and storedGeneration != generation):
+                self.misses += 1
+                return default
+            if self.ttl is not None and created + self.ttl <= now:
+                self._remove(name)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self.hits += 1
+            if name in self.files: self.files[name][1] = now
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return value
+
+    def put(self, group, key, value, generation=None):
+        """
+        Write 'value' for 'key', in the group of repository URL 'group'.
+        Responses that marshal can't write are not cached.
+        """
+        try:
+            data = zlib.compress(marshal.dumps((repr(key), time.time(), generation, value)))
+        except ValueError:
+            return
+        if len(data) > self.maxBytes: return
+        name = self._file_name(group, key, self._read_generation(group))
+        path = os.path.join(self.directory, name)
+        ## Readers in other processes see the old file or the new one, not a part
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp, path)
+        with self.lock:
+            old = self.files.get(name)
+            if old: self.bytes -= old[0]
+            self.files[name] = [len(data), time.time()]
+            self.bytes += len(data)
+            if self.bytes > self.maxBytes:
+                for oldest in sorted(self.files, key=lambda name: self.files[name][1]):
+                    self._remove(oldest)
+                    self.evictions += 1
+                    if self.bytes <= self.maxBytes: break
+
+    def invalidate(self, group=None):
+        """
+        Stop using the files of repository URL 'group' by incrementing its
+        generation, or remove all files.
+        """
+        if group is None:
+            self._remove_all()
+        else:
+            with self.lock:
+                self.markers.pop(group, None)
+                self._write_generation(group, self._read_generation(group) + 1)
+        with self.lock:
+            self.invalidations += 1
+
+    def clear(self):
+        """
+        Remove every file and reset the statistics.
+        """
+        self._remove_all()
+        with self.lock:
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _remove_all(self):
+        with self.lock:
+            self.markers.clear()
+            for name in os.listdir(self.directory):
+                if name.endswith(self.SUFFIX) or name.endswith(self.GENERATION):
+                    self._remove(name)
+
+    def getStats(self):
+        """
+        A QueryCacheStats with the counts of this process, and the files
+        it knows about.
+        """
+        with self.lock:
+            return QueryCacheStats(self.hits, self.misses, self.evictions, self.expirations,
+                                   self.invalidations, len(self.files), self.bytes)
+
+    def __len__(self):
+        return len(self.files)
+
+    def _group_prefix(self, group):
+        return sha1(group).hexdigest()[:12] + '-'
+
+    def _file_name(self, group, key, generation):
+        return '%s%d-%s%s' % (self._group_prefix(group), generation, sha1(repr(key)).hexdigest(), self.SUFFIX)
+
+    def _read_generation(self, group):
+        try:
+            with open(os.path.join(self.directory, self._group_prefix(group) + self.GENERATION)) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return 0
+
+    def _write_generation(self, group, generation):
+        ## Renamed into place, like the responses in put
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            os.write(fd, str(generation))
+        finally:
+            os.close(fd)
+        path = os.path.join(self.directory, self._group_prefix(group) + self.GENERATION)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp, path)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+        entry = self.files.pop(name, None)
+        if entry: self.bytes -= entry[0]
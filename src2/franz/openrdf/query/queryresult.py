@@ -14,6 +14,9 @@
 #from franz.openrdf.exceptions import 
 from ..model import Statement
 from ..repository.repositoryresult import RepositoryResult
+from franz.miniclient.request import RowStream
+
+import sys, threading, time
 
 try:
     from collections import namedtuple
@@ -51,6 +54,9 @@ class TupleQueryResult(QueryResult):
     solutions, each of which represents a single query solution as a set of
     bindings. Note: take care to always close a TupleQueryResult after use to
     free any resources it keeps hold of.
+
+    'string_tuples' is either a list, or a RowStream that produces the
+    tuples while they arrive from the server.
     """
     def __init__(self, variable_names, string_tuples):
         QueryResult.__init__(self)
@@ -59,24 +65,33 @@ class TupleQueryResult(QueryResult):
             string_tuples = [string_tuples]
         self.variable_names = variable_names
         self.string_tuples = string_tuples
+        self.streaming = isinstance(string_tuples, RowStream)
         self.cursor = 0        
-        self.tuple_count = len(string_tuples)        
+        if not self.streaming:
+            self.tuple_count = len(string_tuples)        
         self.binding_set = ListBindingSet(self.variable_names)
     
     def __iter__(self):
         return self
     
     def next(self):
-        if self.cursor >= self.tuple_count:
+        if self.streaming:
+            string_tuple = self.string_tuples.next()
+        elif self.cursor >= self.tuple_count:
             raise StopIteration()
+        else:
+            string_tuple = self.string_tuples[self.cursor]
+            self.cursor += 1
 
         bset = self.binding_set
-        bset._reset(self.string_tuples[self.cursor])
-        self.cursor += 1
+        bset._reset(string_tuple)
         return bset        
 
     def close(self):
-        pass    
+        """
+        For a streaming result, aborts the transfer.
+        """
+        if self.streaming: self.string_tuples.close()
 
     def getBindingNames(self):
         """
@@ -85,12 +100,124 @@ class TupleQueryResult(QueryResult):
         return self.variable_names
         
     def __len__(self):
+        """
+        The number of rows.  For a streaming result, this has to read
+        the remaining ones into memory.
+        """
+        if self.streaming: return len(self.string_tuples)
         return self.tuple_count
     
     def rowCount(self):
         return len(self)
 
 
+class PagedTupleQueryResult(TupleQueryResult):
+    """
+    A TupleQueryResult that reads its rows a page at a time, so that only
+    one or two pages are in memory.  'fetch(offset, limit)' returns the
+    {names, values} response for up to 'limit' rows from 'offset' on.
+    While a page is read, the next one is fetched on a background thread
+    (unless 'prefetch' is false).  A page that fails is asked for again up
+    to 'retries' times, waiting a little longer each time; when it still
+    fails, the error is raised and iterating again starts over with that
+    page.  getOffset tells how many rows have been produced, counting from
+    the start of the whole result, so that an evaluation can also be
+    resumed later.
+    """
+    RETRY_DELAY = 0.5
+
+    def __init__(self, fetch, pageSize, offset=0, limit=None, retries=3, prefetch=True):
+        self.fetch = fetch
+        self.pageSize = pageSize
+        self.offset = offset
+        self.next_offset = offset
+        self.remaining = limit
+        self.retries = retries
+        self.prefetch = prefetch
+        self.finished = False
+        self.pending = None
+        response = self._load(offset, self._page_limit())
+        TupleQueryResult.__init__(self, response['names'], [])
+        self._start_page(response)
+
+    def next(self):
+        while self.cursor >= self.tuple_count:
+            if not self._next_page(): raise StopIteration()
+        string_tuple = self.string_tuples[self.cursor]
+        self.cursor += 1
+        self.offset += 1
+        bset = self.binding_set
+        bset._reset(string_tuple)
+        return bset
+
+    def getOffset(self):
+        """
+        The position, in the whole result, of the next row.
+        """
+        return self.offset
+
+    def close(self):
+        self.finished = True
+        self.pending = None
+        self.string_tuples = []
+        self.tuple_count = self.cursor = 0
+
+    def __len__(self):
+        raise TypeError("The length of a paged result is only known once it has been read.")
+
+    def _page_limit(self):
+        if self.remaining is None: return self.pageSize
+        return min(self.pageSize, self.remaining)
+
+    def _load(self, offset, limit):
+        attempt = 0
+        while True:
+            try:
+                return self.fetch(offset, limit)
+            except Exception:
+                if attempt >= self.retries: raise
+                time.sleep(self.RETRY_DELAY * 2 ** attempt)
+                attempt += 1
+
+    def _start_page(self, response):
+        rows = response['values']
+        limit = self._page_limit()
+        self.string_tuples = rows
+        self.tuple_count = len(rows)
+        self.cursor = 0
+        self.next_offset += len(rows)
+        if self.remaining is not None: self.remaining -= len(rows)
+        self.finished = len(rows) < limit or self.remaining == 0
+        if not self.finished and self.prefetch:
+            self.pending = self._start_fetch(self.next_offset, self._page_limit())
+
+    def _start_fetch(self, offset, limit):
+        outcome = {}
+        def run():
+            try:
+                outcome['response'] = self._load(offset, limit)
+            except Exception:
+                outcome['error'] = sys.exc_info()
+        thread = threading.Thread(target=run)
+        thread.setDaemon(True)
+        thread.start()
+        return thread, outcome
+
+    def _next_page(self):
+        if self.finished: return False
+        if self.pending:
+            (thread, outcome), self.pending = self.pending, None
+            thread.join()
+            if 'error' in outcome:
+                error = outcome['error']
+                raise error[0], error[1], error[2]
+            response = outcome['response']
+        else:
+            response = self._load(self.next_offset, self._page_limit())
+        self._start_page(response)
+        return True
+
+
 class ListBindingSet(object):
     """
     A BindingSet is a set of named value bindings, which is used to
@@ -101,10 +228,18 @@ class ListBindingSet(object):
     ListBindingSet emulates a Sesame BindingSet, a Python dictionary and a list simultaneously.
     The internal datastructure is a pair of lists.  
     """
+    __slots__ = ('variable_names', 'string_tuple', 'value_cache')
+
     def __init__(self, variable_names):
         self.variable_names = variable_names
         self.string_tuple = None
         self.value_cache = [None] * len(variable_names)
+
+    def __getstate__(self):
+        return (self.variable_names, self.string_tuple, self.value_cache)
+
+    def __setstate__(self, state):
+        self.variable_names, self.string_tuple, self.value_cache = state
     
     def _reset(self, string_tuple):
         self.string_tuple = string_tuple
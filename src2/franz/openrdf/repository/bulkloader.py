@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+from __future__ import absolute_import
+from __future__ import with_statement
+
+try:
+    from collections import namedtuple
+except ImportError:
+    from ..util.namedtuple import namedtuple
+
+from ..rio.rdfformat import RDFFormat
+from .repositoryconnection import fileFormatExtension
+
+import mmap, os, sys, threading, time, Queue
+
+EXTENSIONS = ['.nt', '.ntriples', '.nq', '.nquads', '.rdf', '.owl']
+
+## The formats with a statement per line, which can be split
+LINE_FORMATS = {'.nt': RDFFormat.NTRIPLES, '.ntriples': RDFFormat.NTRIPLES,
+                '.nq': RDFFormat.NQUADS, '.nquads': RDFFormat.NQUADS}
+
+RANGE_CHUNK = 1048576
+
+def findFiles(paths, recurse=False, extensions=EXTENSIONS):
+    """
+    The files to load for 'paths'.  A directory contributes the files in it
+    with one of 'extensions' (and those below it when 'recurse' is true), a
+    file with one of 'extensions' itself, and any other file is a listing
+    with a path on each line.  Files compressed with gzip or bzip2 count
+    with the extension before their '.gz' or '.bz2'.  Returns the list of files and the list of
+    paths that do not exist.
+    """
+    found, missing = [], []
+    for path in paths:
+        if not os.path.exists(path):
+            missing.append(path)
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path, topdown=True):
+                for filename in sorted(files):
+                    if fileFormatExtension(filename) in extensions:
+                        found.append(os.path.abspath(os.path.join(root, filename)))
+                if not recurse:
+                    del dirs[:]
+        elif fileFormatExtension(path) in extensions:
+            found.append(os.path.abspath(path))
+        else:
+            with open(path) as listing:
+                for line in listing:
+                    filename = line.strip()
+                    if filename and fileFormatExtension(filename) in extensions:
+                        found.append(filename)
+    return found, missing
+
+def fileSize(path):
+    """
+    The size of 'path', or 0 when it can't be read here (server-side loads
+    may name files that only the server sees).
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def splitFile(path, rangeSize):
+    """
+    Split the file at 'path' into (start, end) byte ranges of about
+    'rangeSize' bytes that end at line boundaries.  The file is mapped
+    into memory, so only the pages around the boundaries are read.
+    """
+    size = os.path.getsize(path)
+    if not size: return []
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            ranges, start = [], 0
+            while start < size:
+                end = start + rangeSize
+                if end >= size:
+                    end = size
+                else:
+                    ## A line that ends right at the boundary stays in this range.
+                    newline = data.find('\n', end - 1)
+                    end = size if newline == -1 else newline + 1
+                ranges.append((start, end))
+                start = end
+            return ranges
+        finally:
+            data.close()
+
+def readRange(path, start, end, chunkSize=RANGE_CHUNK):
+    """
+    The bytes from 'start' to 'end' of the file at 'path', as strings of at
+    most 'chunkSize' bytes read from a memory map of just that range.
+    """
+    offset = start - start % mmap.ALLOCATIONGRANULARITY
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), end - offset, access=mmap.ACCESS_READ, offset=offset)
+        try:
+            for pos in xrange(start - offset, end - offset, chunkSize):
+                yield data[pos:min(pos + chunkSize, end - offset)]
+        finally:
+            data.close()
+
+class FileResult(object):
+    """
+    The outcome of loading one file, or the 'start' to 'end' byte range of
+    one: 'attempts' made, 'seconds' spent on the last one, 'done' once it
+    is committed, and 'error' when every attempt failed.
+    """
+    def __init__(self, path, size, start=None, end=None):
+        self.path = path
+        self.size = size
+        self.start = start
+        self.end = end
+        self.attempts = 0
+        self.seconds = 0.0
+        self.done = False
+        self.error = None
+
+    def __str__(self):
+        return "%s%s: %d bytes, %d attempt%s, %.3f seconds%s" % (
+            self.path, "" if self.start is None else "[%d:%d]" % (self.start, self.end),
+            self.size, self.attempts, "" if self.attempts == 1 else "s", self.seconds,
+            ", failed: %s" % self.error if self.error else "")
+
+class LoadProgress(namedtuple('LoadProgress', 'files filesDone filesFailed bytes bytesDone triples seconds')):
+    """
+    A snapshot of a running load, handed to the progress callback of a
+    BulkLoader.  'triples' is how much the repository has grown so far.
+    """
+    def getTriplesPerSecond(self):
+        return self.triples / (self.seconds or 0.000001)
+
+    def getBytesPerSecond(self):
+        return self.bytesDone / (self.seconds or 0.000001)
+
+    def __str__(self):
+        return "%d/%d files (%d failed), %d/%d bytes, %d triples in %.1f seconds (%.0f triples/second, %.0f bytes/second)" % (
+            self.filesDone, self.files, self.filesFailed, self.bytesDone, self.bytes, self.triples,
+            self.seconds, self.getTriplesPerSecond(), self.getBytesPerSecond())
+
+class LoadSummary(object):
+    """
+    What BulkLoader.load did: a FileResult per file or range, in the
+    order they were scheduled, the paths that were not found, the number of triples
+    the repository grew by and the wall-clock seconds taken.
+    """
+    def __init__(self, results, missing, triples, seconds):
+        self.results = results
+        self.missing = missing
+        self.triples = triples
+        self.seconds = seconds
+
+    def getLoaded(self):
+        return [result for result in self.results if result.done]
+
+    def getFailed(self):
+        return [result for result in self.results if result.error]
+
+    def getBytes(self):
+        return sum(result.size for result in self.getLoaded())
+
+    def getRetries(self):
+        return sum(result.attempts - 1 for result in self.results if result.attempts)
+
+    def getTriplesPerSecond(self):
+        return self.triples / (self.seconds or 0.000001)
+
+    def getBytesPerSecond(self):
+        return self.getBytes() / (self.seconds or 0.000001)
+
+    def __str__(self):
+        return "%d files loaded, %d failed, %d retries, %d bytes, %d triples in %.1f seconds (%.0f triples/second, %.0f bytes/second)" % (
+            len(self.getLoaded()), len(self.getFailed()), self.getRetries(), self.getBytes(),
+            self.triples, self.seconds, self.getTriplesPerSecond(), self.getBytesPerSecond())
+
+class BulkLoader(object):
+    """
+    Loads many RDF files into a repository at once.  Every worker thread
+    has a connection with a session of its own and takes the next file
+    from a queue that holds the largest files first, so the long loads
+    start early and the small ones fill the gaps at the end.  Each file
+    is committed on its own; a failing file is rolled back and tried
+    again, up to 'retries' more times, after the files still waiting.
+
+    With 'serverSide' true, the server reads the files itself, which
+    needs it to see the same paths; otherwise the files are sent in the
+    requests.  'context' is the context for every file, or a function of
+    the path returning it; 'baseURI' is used for RDF/XML files.  Files
+    compressed with gzip or bzip2 are decompressed on the client (see
+    RepositoryConnection.addFile); their sizes, and so bytes/second, are
+    the compressed ones.
+
+    With 'splitSize', uncompressed N-Triples and N-Quads files larger than
+    that many bytes are split at line boundaries into ranges of about that
+    size (see splitFile), which are loaded, committed and retried on their own,
+    so that a single huge file is loaded by all workers.  The ranges are
+    always read on the client.  Blank node labels only have a meaning
+    within one request, so don't split files whose blank nodes are used
+    on lines far apart.
+
+    'progress', when given, is called with a LoadProgress every
+    'progressInterval' seconds, and once more at the end:
+
+        loader = BulkLoader(repository, workers=8, progress=printProgress)
+        summary = loader.load(['/data/lubm'], recurse=True)
+        for result in summary.getFailed(): print result
+    """
+    def __init__(self, repository, workers=4, serverSide=False, context=None, baseURI=None,
+                 retries=2, lifetime=7200, progress=None, progressInterval=5.0, splitSize=None):
+        self.repository = repository
+        self.workers = workers
+        self.serverSide = serverSide
+        self.context = context
+        self.baseURI = baseURI
+        self.retries = retries
+        self.lifetime = lifetime
+        self.progress = progress
+        self.progressInterval = progressInterval
+        self.splitSize = splitSize
+
+    def load(self, paths, recurse=False, extensions=EXTENSIONS):
+        """
+        Load the files found in 'paths' (see findFiles) and return a
+        LoadSummary.  Errors of single files are recorded in the summary
+        rather than raised.
+        """
+        if isinstance(paths, basestring): paths = [paths]
+        files, missing = findFiles(paths, recurse, extensions)
+        results = []
+        for path in files:
+            size = fileSize(path)
+            if self.splitSize and size > self.splitSize and os.path.splitext(path)[1].lower() in LINE_FORMATS:
+                results.extend(FileResult(path, end - start, start, end)
+                               for start, end in splitFile(path, self.splitSize))
+            else:
+                results.append(FileResult(path, size))
+        results.sort(key=lambda result: -result.size)
+        return self._load(results, missing)
+
+    def _load(self, results, missing):
+        queue = Queue.Queue()
+        for result in results:
+            queue.put(result)
+        self._results = results
+        self._sessionErrors = []
+        ## Results not loaded or given up yet; workers wait for retries
+        ## until it drops to zero.
+        self._pending = len(results)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        monitor = self.repository.getConnection()
+        try:
+            initialSize = monitor.size()
+            self._start = time.time()
+            threads = []
+            for i in range(min(self.workers, len(results)) or 1):
+                thread = threading.Thread(target=self._work, args=(queue,))
+                thread.setDaemon(True)
+                thread.start()
+                threads.append(thread)
+            reporter = None
+            if self.progress:
+                reporter = threading.Thread(target=self._report, args=(monitor, initialSize))
+                reporter.setDaemon(True)
+                reporter.start()
+            for thread in threads:
+                thread.join()
+            ## Only left over when no worker could open a session.
+            while not queue.empty():
+                result = queue.get()
+                result.attempts = result.attempts or 1
+                result.error = self._sessionErrors[0]
+            self._done.set()
+            if reporter: reporter.join()
+            triples = monitor.size() - initialSize
+            seconds = time.time() - self._start
+            if self.progress:
+                self.progress(self._snapshot(triples, seconds, final=True))
+        finally:
+            monitor.close()
+        return LoadSummary(results, list(missing), triples, seconds)
+
+    def _contextFor(self, path):
+        if callable(self.context):
+            return self.context(path)
+        return self.context
+
+    def _work(self, queue):
+        conn = self.repository.getConnection()
+        try:
+            conn.openSession(autocommit=False, lifetime=self.lifetime)
+        except Exception:
+            ## The other workers will take the files.
+            self._sessionErrors.append(sys.exc_info()[1])
+            conn.close()
+            return
+        try:
+            while True:
+                try:
+                    result = queue.get(True, 0.5)
+                except Queue.Empty:
+                    ## Another worker may still put back a file to retry.
+                    if not self._pending: break
+                    continue
+                result.attempts += 1
+                start = time.time()
+                try:
+                    context = self._contextFor(result.path)
+                    if result.start is None:
+                        conn.addFile(result.path, base=self.baseURI, context=context, serverSide=self.serverSide)
+                    else:
+                        conn.addData(readRange(result.path, result.start, result.end),
+                                     LINE_FORMATS[os.path.splitext(result.path)[1].lower()], context=context)
+                    conn.commit()
+                    result.error = None
+                    result.done = True
+                except Exception:
+                    result.error = sys.exc_info()[1]
+                    try: conn.rollback()
+                    except Exception: pass
+                result.seconds = time.time() - start
+                if result.error and result.attempts <= self.retries:
+                    queue.put(result)
+                else:
+                    with self._lock:
+                        self._pending -= 1
+        finally:
+            try: conn.closeSession()
+            finally: conn.close()
+
+    def _report(self, monitor, initialSize):
+        while not self._done.wait(self.progressInterval) and not self._done.isSet():
+            try:
+                triples = monitor.size() - initialSize
+            except Exception:
+                continue
+            self.progress(self._snapshot(triples, time.time() - self._start))
+
+    def _snapshot(self, triples, seconds, final=False):
+        results = self._results
+        done = [result for result in results if result.done]
+        ## Until the end, a result with an error and attempts left is waiting for a retry.
+        failed = [result for result in results if result.error and (final or result.attempts > self.retries)]
+        return LoadProgress(len(results), len(done), len(failed), sum(result.size for result in results),
+                            sum(result.size for result in done), triples, seconds)
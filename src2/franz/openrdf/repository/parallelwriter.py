@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+from __future__ import absolute_import
+
+from ..query.dataset import ALL_CONTEXTS
+
+import sys, threading, time, Queue
+
+def subject_partition(quad, count):
+    """
+    The default partition function: quads with the same subject, and so
+    the triples of a blank node, go to the same session.
+    """
+    return hash(quad[0]) % count
+
+class WriterStats(object):
+    """
+    What one worker of a ParallelWriter has done so far.  'seconds' is the
+    time spent in requests, 'error' the exception that stopped the worker.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.triples = 0
+        self.batches = 0
+        self.commits = 0
+        self.seconds = 0.0
+        self.error = None
+
+    def getThroughput(self):
+        """
+        Triples per second of request time.
+        """
+        return self.triples / (self.seconds or 0.000001)
+
+    def __str__(self):
+        return "worker %d: %d triples in %d batches, %d commits, %.0f triples/second%s" % (
+            self.index, self.triples, self.batches, self.commits, self.getThroughput(),
+            ", failed: %s" % self.error if self.error else "")
+
+class ParallelWriter(object):
+    """
+    Adds triples over several sessions at once, so that the server can use
+    a core for each.  Every worker thread has a connection with a session
+    of its own, takes batches of 'batchSize' quads from a bounded queue,
+    and commits every 'commitEvery' triples it has added and when the
+    writer is closed.  Quads are assigned to workers by 'partition', a
+    function of a quad (a list of N-Triples strings) and the number of
+    workers, which by default hashes the subject.
+
+    A failing worker stops taking triples; its error is raised by the next
+    call to addTriples, and by close.  Use it as a context manager, or call
+    close when done:
+
+        with ParallelWriter(repository, workers=8) as writer:
+            writer.addTriples(triples)
+        print writer.getStats()
+    """
+    def __init__(self, repository, workers=4, batchSize=1000, commitEvery=10000, queueSize=4,
+                 partition=subject_partition, lifetime=None):
+        self.batchSize = batchSize
+        self.commitEvery = commitEvery
+        self.partition = partition
+        self.errors = []
+        self.closed = False
+        self.pending = [[] for i in range(workers)]
+        self.stats = [WriterStats(i) for i in range(workers)]
+        self.queues = [Queue.Queue(queueSize) for i in range(workers)]
+        self.connections = []
+        try:
+            for i in range(workers):
+                conn = repository.getConnection()
+                conn.openSession(autocommit=False, lifetime=lifetime)
+                self.connections.append(conn)
+        except:
+            for conn in self.connections:
+                conn.closeSession()
+                conn.close()
+            raise
+        ## Used only to convert terms
+        self.converter = self.connections[0]
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, args=(i,))
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            ## Don't hide the original exception
+            try: self.close()
+            except Exception: pass
+
+    def addTriple(self, subject, predicate, object, context=None):
+        self.addTriples([(subject, predicate, object, context)])
+
+    def addTriples(self, triples_or_quads, context=ALL_CONTEXTS, ntriples=False):
+        """
+        Queue the supplied triples or quads, which are converted as in
+        RepositoryConnection.addTriples.  Blocks while the queue of a
+        worker is full.
+        """
+        self._checkOpen()
+        self._check()
+        converter = self.converter
+        contexts = converter._contexts_to_ntriple_contexts(context, none_is_mini_null=True)
+        count = len(self.pending)
+        for q in triples_or_quads:
+            quad = converter._to_mini_quad(q, contexts, ntriples)
+            index = self.partition(quad, count)
+            batch = self.pending[index]
+            batch.append(quad)
+            if len(batch) >= self.batchSize:
+                self._send(index)
+
+    def flush(self):
+        """
+        Hand the partial batches to the workers.
+        """
+        self._checkOpen()
+        self._flush()
+
+    def _flush(self):
+        for index in range(len(self.pending)):
+            if self.pending[index]: self._send(index)
+
+    def _send(self, index):
+        batch, self.pending[index] = self.pending[index], []
+        self.queues[index].put(batch)
+        self._check()
+
+    def _checkOpen(self):
+        ## The workers are gone, nothing would take the batches
+        if self.closed:
+            raise ValueError("The ParallelWriter is closed.")
+
+    def _check(self):
+        if self.errors:
+            error = self.errors[0]
+            raise error[0], error[1], error[2]
+
+    def _work(self, index):
+        conn, queue, stats = self.connections[index], self.queues[index], self.stats[index]
+        uncommitted = 0
+        while True:
+            batch = queue.get()
+            if batch is None: break
+            if stats.error: continue # drain, so that addTriples does not block
+            try:
+                start = time.time()
+                conn.addTriples(batch, ntriples=True)
+                uncommitted += len(batch)
+                if self.commitEvery and uncommitted >= self.commitEvery:
+                    conn.commit()
+                    stats.commits += 1
+                    uncommitted = 0
+                stats.seconds += time.time() - start
+                stats.triples += len(batch)
+                stats.batches += 1
+            except Exception:
+                stats.error = sys.exc_info()[1]
+                self.errors.append(sys.exc_info())
+        if uncommitted and not stats.error:
+            try:
+                start = time.time()
+                conn.commit()
+                stats.seconds += time.time() - start
+                stats.commits += 1
+            except Exception:
+                stats.error = sys.exc_info()[1]
+                self.errors.append(sys.exc_info())
+
+    def getStats(self):
+        """
+        A WriterStats for each worker.
+        """
+        return self.stats
+
+    def getThroughput(self):
+        """
+        The sum of the throughputs of the workers.
+        """
+        return sum(stats.getThroughput() for stats in self.stats)
+
+    def close(self):
+        """
+        Send what is left, commit every session, close the sessions and
+        raise the first error of any worker.  Adding triples afterwards
+        raises ValueError.
+        """
+        if self.closed: return
+        self.closed = True
+        try:
+            if not self.errors: self._flush()
+        finally:
+            for queue in self.queues:
+                queue.put(None)
+            for thread in self.threads:
+                thread.join()
+            for conn in self.connections:
+                try: conn.closeSession()
+                finally: conn.close()
+        self._check()
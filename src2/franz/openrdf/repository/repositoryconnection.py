@@ -14,6 +14,7 @@ from __future__ import absolute_import
 from __future__ import with_statement
 
 from .repositoryresult import RepositoryResult
+from .writebuffer import WriteBuffer
 
 from ..exceptions import IllegalOptionException, IllegalArgumentException
 from ..model import Statement, Value, URI
@@ -23,10 +24,49 @@ from ..query.query import Query, TupleQuery, GraphQuery, BooleanQuery, QueryLang
 from ..rio.rdfformat import RDFFormat
 from ..util import uris
 from ..vocabulary import RDF, RDFS, OWL, XMLSchema
+from franz.miniclient.executor import Executor
+from franz.miniclient.request import RowStream, fileCompression
 
-import copy, datetime, os
+import copy, datetime, functools, os, sys, threading, time, Queue
+import cjson
 from contextlib import contextmanager
 
+try:
+    from collections import namedtuple
+except ImportError:
+    from ..util.namedtuple import namedtuple
+
+def fileFormatExtension(filePath):
+    """
+    The lower-case extension that gives the format of 'filePath', looking
+    past a compression extension: '.nt' for 'dump.nt.gz'.
+    """
+    if fileCompression(filePath):
+        filePath = os.path.splitext(filePath)[0]
+    return os.path.splitext(filePath)[1].lower()
+
+def _invalidates_query_cache(method):
+    """
+    For the RepositoryConnection methods that change the store: drop the
+    cached query results of the repository (see setQueryCache) afterwards.
+    Calls these methods make to each other only invalidate once, when the
+    outermost one returns, and writes left in the write buffer invalidate
+    when they are sent.
+    """
+    @functools.wraps(method)
+    def invalidating(self, *args, **kwargs):
+        state = self._cache_writes
+        depth = getattr(state, 'depth', 0)
+        if not depth: state.sent = False
+        state.depth = depth + 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            state.depth = depth
+            if not depth and (state.sent or not self._write_buffer.count):
+                self._invalidate_query_cache()
+    return invalidating
+
 # * Main interface for updating data in and performing queries on a Sesame
 # * repository. By default, a RepositoryConnection is in autoCommit mode, meaning
 # * that each operation corresponds to a single transaction on the underlying
@@ -72,19 +112,103 @@ class RepositoryConnection(object):
         self.mini_repository = repository.mini_repository
         self.is_closed = False
         self._add_commit_size = None
+        self._write_buffer = WriteBuffer(self)
+        self._query_cache = None
+        ## Per thread: how deeply _invalidates_query_cache methods are
+        ## nested, and whether the write buffer sent anything meanwhile
+        self._cache_writes = threading.local()
+        ## How many requests size and removeTriples make at once for several contexts
+        self.context_concurrency = 8
 
     def getSpec(self):
         return self.repository.getSpec()
 
     def _get_mini_repository(self):
+        ## Every request other than a buffered write comes through here,
+        ## so pending writes are sent before it.
+        if self._write_buffer.count:
+            self._write_buffer.flush()
         return self.mini_repository
         
     def getValueFactory(self):
         return self.repository.getValueFactory()
         
     def close(self):
+        self.flush()
         self.is_closed = True
+
+    def flush(self):
+        """
+        Send the statement adds and removes that are waiting in the write
+        buffer (see setWriteBehind).
+        """
+        if self._write_buffer.count:
+            self._write_buffer.flush()
+
+    def setWriteBehind(self, enabled=True, size=WriteBuffer.SIZE, bytes=WriteBuffer.BYTES,
+                       maxAge=WriteBuffer.MAX_AGE):
+        """
+        Adding or removing an iterable of statements always sends them in
+        batches of up to 'size' statements or about 'bytes' bytes.  With
+        write-behind enabled, single statement adds and removes are buffered
+        as well, and the buffer is kept between calls until it fills up, a
+        write finds it older than 'maxAge' seconds (None for no limit), or
+        another request is made on this connection (any read, commit,
+        rollback, ...), or the connection is flushed or closed.  The age
+        is only checked by writes, so writes followed by a pause stay
+        buffered until one of the others happens.  Errors of buffered
+        writes are raised by the call that sends them.
+        """
+        buffer = self._write_buffer
+        if not enabled: self.flush()
+        buffer.persistent = bool(enabled)
+        buffer.size = size
+        buffer.bytes = bytes
+        buffer.maxAge = maxAge
+
+    def getWriteBehind(self):
+        return self._write_buffer.persistent
+
+    write_behind = property(getWriteBehind, setWriteBehind,
+        "True when single statement adds and removes are buffered between calls.\n"
+        "See setWriteBehind.\n")
+
+    @contextmanager
+    def _buffered_writes(self):
+        buffer = self._write_buffer
+        buffer.depth += 1
+        try:
+            yield buffer
+        finally:
+            buffer.depth -= 1
+            if not buffer.is_active(): self.flush()
     
+    def setQueryCache(self, cache):
+        """
+        Answer queries from 'cache', a QueryCache or DiskQueryCache that may
+        be shared with other connections, or from the server only when it is
+        None.  Streamed results are never cached.
+        """
+        self._query_cache = cache
+
+    def getQueryCache(self):
+        return self._query_cache
+
+    query_cache = property(getQueryCache, setQueryCache,
+        "The QueryCache that query results are kept in, or None.\n"
+        "See setQueryCache.\n")
+
+    def _query_cache_group(self):
+        return self.repository.mini_repository.url
+
+    def _invalidate_query_cache(self):
+        if self._query_cache is None: return
+        state = self._cache_writes
+        if getattr(state, 'depth', 0):
+            state.sent = True
+        else:
+            self._query_cache.invalidate(self._query_cache_group())
+
     def setAddCommitSize(self, triple_count):
         if not triple_count or triple_count < 0:
             self._add_commit_size = None
@@ -172,10 +296,7 @@ class RepositoryConnection(object):
         elif len(cxts) == 1:
             return self._get_mini_repository().getSize(cxts[0])
         else:
-            total = 0
-            for cxt in cxts:
-                total += self._get_mini_repository().getSize(cxt)
-            return total
+            return sum(self._for_each_context('getSize', cxts))
 
 #     * Returns <tt>true</tt> if this repository does not contain any (explicit)
 #     * statements.
@@ -270,12 +391,14 @@ class RepositoryConnection(object):
             return self._to_ntriples(term)
     
     def getStatements(self, subject, predicate,  object, contexts=ALL_CONTEXTS, includeInferred=False,
-                       limit=None, tripleIDs=False):
+                       limit=None, tripleIDs=False, stream=False):
         """
         Gets all statements with a specific subject, predicate and/or object from
         the repository. The result is optionally restricted to the specified set
         of named contexts.  Returns a RepositoryResult that produces a 'Statement'
-        each time that 'next' is called.
+        each time that 'next' is called.  If 'stream' is True, the statements
+        are produced while they arrive from the server; close the result to
+        abandon the rest.
         """
         subj = self._convert_term_to_mini_term(subject)
         pred = self._convert_term_to_mini_term(predicate)
@@ -283,6 +406,11 @@ class RepositoryConnection(object):
         cxt = self._contexts_to_ntriple_contexts(contexts)
         if isinstance(object, GeoSpatialRegion):
             return self._getStatementsInRegion(subj, pred, obj, cxt, limit=limit)
+        elif stream:
+            mini = self._get_mini_repository()
+            stringTuples = RowStream(lambda reader: mini.getStatements(subj, pred, obj, cxt,
+                 infer=includeInferred, callback=reader, limit=limit, tripleIDs=tripleIDs))
+            return RepositoryResult(stringTuples, tripleIDs=tripleIDs)
         else:
             stringTuples = self._get_mini_repository().getStatements(subj, pred, obj, cxt,
                  infer=includeInferred, limit=limit, tripleIDs=tripleIDs)
@@ -338,6 +466,7 @@ class RepositoryConnection(object):
                  limit=limit, tripleIDs=tripleIDs)
         return JDBCStatementResultSet(stringTuples, triple_ids=tripleIDs)
 
+    @_invalidates_query_cache
     def add(self, arg0, arg1=None, arg2=None, contexts=None, base=None, format=None, serverSide=False):
         """
         Calls addTriple, addStatement, or addFile.  If 'contexts' is not
@@ -358,22 +487,21 @@ class RepositoryConnection(object):
         elif isinstance(arg0, Statement):
             return self.addStatement(arg0, contexts=contexts)
         elif hasattr(arg0, '__iter__'):
-            for s in arg0:
-                self.addStatement(s, contexts=contexts)
+            with self._buffered_writes():
+                for s in arg0:
+                    self.addStatement(s, contexts=contexts)
         else:
             raise IllegalArgumentException("Illegal first argument to 'add'.  Expected a Value, Statement, File, or string.")
             
+    @_invalidates_query_cache
     def addFile(self, filePath, base=None, format=None, context=None, serverSide=False):
         """
         Load the file or file path 'filePath' into the store.  'base' optionally defines a base URI,
-        'format' is RDFFormat.NTRIPLES or RDFFormat.RDFXML, and 'context' optionally specifies
-        which context the triples will be loaded into.
+        'format' is RDFFormat.NTRIPLES, RDFFormat.NQUADS or RDFFormat.RDFXML, and 'context' optionally
+        specifies which context the triples will be loaded into.  Files compressed with gzip or
+        bzip2 (ending in .gz or .bz2) are decompressed on the client while they are sent.
         """
-        if isinstance(context, (list, tuple)):
-            if len(context) > 1:
-                raise IllegalArgumentException("Multiple contexts passed to 'addFile': %s" % context)
-            context = context[0] if context else None
-        contextString = self._context_to_ntriples(context, none_is_mini_null=True)
+        contextString = self._load_context(context, 'addFile')
 
         if isinstance(filePath, file):
             filePath = os.path.abspath(filePath.name)
@@ -385,16 +513,47 @@ class RepositoryConnection(object):
                 testPath = os.path.abspath(os.path.expanduser(filePath))
                 if os.path.exists(testPath):
                     filePath = testPath
-        fileExt = os.path.splitext(filePath)[1].lower()
+        miniFormat = self._mini_format(format, fileFormatExtension(filePath))
+        if miniFormat is None:
+            raise Exception("Failed to specify a format for the file '%s'." % filePath)
+        self._get_mini_repository().loadFile(filePath, miniFormat, context=contextString,
+            baseURI=base if miniFormat == 'rdf/xml' else None,
+            serverSide=serverSide, commitEvery=self.add_commit_size)
+
+    @_invalidates_query_cache
+    def addData(self, data, format, base=None, context=None):
+        """
+        Load 'data' in 'format' (RDFFormat.NTRIPLES, RDFFormat.NQUADS or RDFFormat.RDFXML) into
+        the store.  'data' is a string, a file object or an iterable producing strings; the last
+        two are streamed to the server.  'base' and 'context' are as in addFile.
+        """
+        miniFormat = self._mini_format(format, None)
+        if miniFormat is None:
+            raise IllegalArgumentException("Unsupported format passed to 'addData': %s" % format)
+        self._get_mini_repository().loadData(data, miniFormat, context=self._load_context(context, 'addData'),
+            baseURI=base if miniFormat == 'rdf/xml' else None, commitEvery=self.add_commit_size)
+
+    def _load_context(self, context, caller):
+        if isinstance(context, (list, tuple)):
+            if len(context) > 1:
+                raise IllegalArgumentException("Multiple contexts passed to '%s': %s" % (caller, context))
+            context = context[0] if context else None
+        return self._context_to_ntriples(context, none_is_mini_null=True)
+
+    @staticmethod
+    def _mini_format(format, fileExt):
+        """
+        The miniclient name of 'format', or of the format that 'fileExt' stands for.
+        """
         if format == RDFFormat.NTRIPLES or fileExt in ['.nt', '.ntriples']:
-            self._get_mini_repository().loadFile(filePath, 'ntriples', context=contextString, serverSide=serverSide,
-                commitEvery=self.add_commit_size)
+            return 'ntriples'
+        elif format == RDFFormat.NQUADS or fileExt in ['.nq', '.nquads']:
+            return 'nquads'
         elif format == RDFFormat.RDFXML or fileExt in ['.rdf', '.owl']:
-            self._get_mini_repository().loadFile(filePath, 'rdf/xml', context=contextString, baseURI=base,
-                serverSide=serverSide, commitEvery=self.add_commit_size)
-        else:
-            raise Exception("Failed to specify a format for the file '%s'." % filePath)
+            return 'rdf/xml'
+        return None
         
+    @_invalidates_query_cache
     def addTriple(self, subject, predicate, object, contexts=None):
         """
         Add the supplied triple of values to this repository, optionally to
@@ -402,9 +561,16 @@ class RepositoryConnection(object):
         """ 
         obj = self.getValueFactory().object_position_term_to_openrdf_term(object, predicate=predicate)
         cxts = self._contexts_to_ntriple_contexts(contexts, none_is_mini_null=True)
-        for cxt in cxts:
-            self._get_mini_repository().addStatement(self._to_ntriples(subject), self._to_ntriples(predicate),
-                        self._convert_term_to_mini_term(obj), cxt)
+        buffer = self._write_buffer
+        quads = [[self._to_ntriples(subject), self._to_ntriples(predicate),
+                  self._convert_term_to_mini_term(obj), cxt] for cxt in cxts]
+        if buffer.is_active():
+            for quad in quads: buffer.add(quad)
+        elif len(quads) == 1:
+            self._get_mini_repository().addStatement(*quads[0])
+        else:
+            ## One request for all the contexts
+            self._get_mini_repository().addStatements(quads)
         
     def _to_ntriples(self, term):
         """
@@ -416,40 +582,110 @@ class RepositoryConnection(object):
             return term
         else: return term.toNTriples();
         
-    def addTriples(self, triples_or_quads, context=ALL_CONTEXTS, ntriples=False):
+    @_invalidates_query_cache
+    def addTriples(self, triples_or_quads, context=ALL_CONTEXTS, ntriples=False,
+                   chunkSize=None, chunkBytes=None, progress=None):
         """
         Add the supplied triples or quads to this repository.  Each triple can
         be a list or a tuple of Values.   If 'context' is set, then 
         the context is substituted in for each triple.  If 'ntriples' is True,
         then the triples or quads are assumed to contain valid ntriples strings,
         and they are passed to the server with no conversion.        
+
+        If 'chunkSize' (a number of triples) or 'chunkBytes' is set,
+        'triples_or_quads' can be any iterator, and is sent in chunks of at
+        most that size.  A worker thread converts and encodes the next chunk
+        while the current one is uploaded, so at most two chunks are held in
+        memory.  'progress', if given, is called with a ChunkReport after each
+        chunk.  Returns the number of triples added in that case.
         """
         ntripleContexts = self._contexts_to_ntriple_contexts(context, none_is_mini_null=True)
-        quads = []
-        for q in triples_or_quads:
-            isQuad = len(q) == 4
-            quad = [None] * 4
-            if ntriples:
-                quad[0] = q[0]
-                quad[1] = q[1]
-                quad[2] = q[2]
-                quad[3] = q[3] if isQuad and q[3] else ntripleContexts
-            elif isinstance(quad, (list, tuple)):
-                predicate = q[1]
-                obj = self.getValueFactory().object_position_term_to_openrdf_term(q[2], predicate=predicate)
-                quad[0] = self._to_ntriples(q[0])
-                quad[1] = self._to_ntriples(predicate)
-                quad[2] = self._to_ntriples(obj)
-                quad[3] = self._to_ntriples(q[3]) if isQuad and q[3] else ntripleContexts
-            else: # must be a statement
-                predicate = q.getPredicate()
-                obj = self.getValueFactory().object_position_term_to_openrdf_term(q.getObject(), predicate=predicate)
-                quad[0] = self._to_ntriples(q.getSubject())
-                quad[1] = self._to_ntriples(predicate)
-                quad[2] = self._to_ntriples(obj)
-                quad[3] = self._to_ntriples(q.getContext()) if isQuad and q.getContext() else ntripleContexts
-            quads.append(quad)
-        self._get_mini_repository().addStatements(quads, commitEvery=self.add_commit_size)
+        quads = (self._to_mini_quad(q, ntripleContexts, ntriples) for q in triples_or_quads)
+        if chunkSize or chunkBytes:
+            return self._add_chunked(quads, chunkSize, chunkBytes, progress)
+        self._get_mini_repository().addStatements(list(quads), commitEvery=self.add_commit_size)
+
+    def _to_mini_quad(self, q, ntripleContexts, ntriples):
+        isQuad = len(q) == 4
+        quad = [None] * 4
+        if ntriples:
+            quad[0] = q[0]
+            quad[1] = q[1]
+            quad[2] = q[2]
+            quad[3] = q[3] if isQuad and q[3] else ntripleContexts
+        elif isinstance(quad, (list, tuple)):
+            predicate = q[1]
+            obj = self.getValueFactory().object_position_term_to_openrdf_term(q[2], predicate=predicate)
+            quad[0] = self._to_ntriples(q[0])
+            quad[1] = self._to_ntriples(predicate)
+            quad[2] = self._to_ntriples(obj)
+            quad[3] = self._to_ntriples(q[3]) if isQuad and q[3] else ntripleContexts
+        else: # must be a statement
+            predicate = q.getPredicate()
+            obj = self.getValueFactory().object_position_term_to_openrdf_term(q.getObject(), predicate=predicate)
+            quad[0] = self._to_ntriples(q.getSubject())
+            quad[1] = self._to_ntriples(predicate)
+            quad[2] = self._to_ntriples(obj)
+            quad[3] = self._to_ntriples(q.getContext()) if isQuad and q.getContext() else ntripleContexts
+        return quad
+
+    def _add_chunked(self, quads, chunkSize, chunkBytes, progress):
+        mini = self._get_mini_repository()
+        ## One chunk uploading, one being prepared
+        slots = threading.Semaphore(2)
+        chunks = Queue.Queue()
+        stopped = threading.Event()
+        errors = []
+
+        def take_chunk():
+            chunk, size = [], 0
+            for quad in quads:
+                chunk.append(quad)
+                if chunkBytes:
+                    size += sum(len(term) + 3 for term in quad if isinstance(term, basestring)) + 4
+                if (chunkSize and len(chunk) >= chunkSize) or (chunkBytes and size >= chunkBytes):
+                    break
+            return chunk
+
+        def encode():
+            try:
+                while True:
+                    slots.acquire()
+                    if stopped.isSet(): return
+                    start = time.time()
+                    chunk = take_chunk()
+                    if not chunk: break
+                    chunks.put((cjson.encode(chunk), len(chunk), time.time() - start))
+                    del chunk
+            except Exception:
+                errors.append(sys.exc_info())
+            chunks.put(None)
+
+        worker = threading.Thread(target=encode)
+        worker.setDaemon(True)
+        worker.start()
+        total = index = 0
+        try:
+            while True:
+                item = chunks.get()
+                if item is None:
+                    if errors: raise errors[0][0], errors[0][1], errors[0][2]
+                    break
+                body, count, encodeSeconds = item
+                item = None
+                start = time.time()
+                mini.addStatements(body, commitEvery=self.add_commit_size)
+                report = ChunkReport(index, count, len(body), encodeSeconds, time.time() - start)
+                body = None
+                slots.release()
+                total += count
+                index += 1
+                if progress: progress(report)
+        finally:
+            if worker.isAlive():
+                stopped.set()
+                slots.release()
+        return total
                 
 #     * Adds the supplied statement to this repository, optionally to one or more
 #     * named contexts.
@@ -469,6 +705,7 @@ class RepositoryConnection(object):
 #     *         because the repository is not writable.
 
 
+    @_invalidates_query_cache
     def addStatement(self, statement, contexts=None):
         """
         Add the supplied statement to the specified contexts in the repository.
@@ -476,6 +713,7 @@ class RepositoryConnection(object):
         self.addTriple(statement.getSubject(), statement.getPredicate(), statement.getObject(),
                        contexts=contexts)      
 
+    @_invalidates_query_cache
     def remove(self, arg0, arg1=None, arg2=None, contexts=None):
         """
         Remove the supplied triple of values from this repository, optionally to
@@ -486,11 +724,13 @@ class RepositoryConnection(object):
         if isinstance(arg0, Value) or arg0 is None: self.removeTriples(arg0, arg1, arg2, contexts=contexts)
         elif isinstance(arg0, Statement): self.removeStatement(arg0, contexts=contexts)
         elif hasattr(arg0, '__iter__'):
-            for s in arg0:
-                self.removeStatement(s, contexts=contexts)
+            with self._buffered_writes():
+                for s in arg0:
+                    self.removeStatement(s, contexts=contexts)
         else:
             raise IllegalArgumentException("Illegal first argument to 'remove'.  Expected a Value, Statement, or iterator.")
 
+    @_invalidates_query_cache
     def removeTriples(self, subject, predicate, object, contexts=ALL_CONTEXTS):
         """
         Removes the statement(s) with the specified subject, predicate and object
@@ -500,12 +740,34 @@ class RepositoryConnection(object):
         pred = self._to_ntriples(predicate)
         obj = self._to_ntriples(self.getValueFactory().object_position_term_to_openrdf_term(object))
         ntripleContexts = self._contexts_to_ntriple_contexts(contexts, none_is_mini_null=True)   
-        if ntripleContexts is None or len(ntripleContexts) == 0:
+        buffer = self._write_buffer
+        if (buffer.is_active() and subj and pred and obj and ntripleContexts
+            and not isinstance(object, RangeLiteral)):
+            ## A fully specified statement, which can be deleted as a quad
+            for cxt in ntripleContexts:
+                buffer.remove([subj, pred, obj, cxt])
+        elif ntripleContexts is None or len(ntripleContexts) == 0:
             self._get_mini_repository().deleteMatchingStatements(subj, pred, obj, None)
         else:
-            for cxt in ntripleContexts:
-                self._get_mini_repository().deleteMatchingStatements(subj, pred, obj, cxt)
+            self._for_each_context('deleteMatchingStatements', ntripleContexts, subj, pred, obj)
 
+    def _for_each_context(self, method, contexts, *args):
+        """
+        Call 'method' of the miniclient repository with 'args' and each of
+        'contexts', running up to 'context_concurrency' of the requests at
+        the same time, and return the results in the order of 'contexts'.
+        The first error, in that order, is raised once all are done.
+        """
+        mini = self._get_mini_repository()
+        if len(contexts) == 1 or self.context_concurrency <= 1:
+            return [getattr(mini, method)(*(args + (cxt,))) for cxt in contexts]
+        executor = Executor(self.context_concurrency)
+        view = mini.withExecutor(executor)
+        futures = [getattr(view, method)(*(args + (cxt,))) for cxt in contexts]
+        executor.run()
+        return [future.result() for future in futures]
+
+    @_invalidates_query_cache
     def removeQuads(self, quads, ntriples=False):
         """
         Remove enumerated quads from this repository.  Each quad can
@@ -538,6 +800,7 @@ class RepositoryConnection(object):
             removeQuads.append(quad)
         self._get_mini_repository().deleteStatements(removeQuads)
 
+    @_invalidates_query_cache
     def removeQuadsByID(self, tids):
         """
         'tids' contains a list of triple/tuple IDs (integers).
@@ -558,11 +821,12 @@ class RepositoryConnection(object):
 #     * @throws RepositoryException
 #     *         If the statement could not be removed from the repository, for
 #     *         example because the repository is not writable.
+    @_invalidates_query_cache
     def removeStatement(self, statement, contexts=None):
         """
         Removes the supplied statement(s) from the specified contexts in the repository.
         """
-        self.removeTriples(statement.getSubject(), statement.getPredicate(), statement.getContext(), contexts=contexts)
+        self.removeTriples(statement.getSubject(), statement.getPredicate(), statement.getObject(), contexts=contexts)
 
 #     * Removes all statements from a specific contexts in the repository.
 #     * 
@@ -573,6 +837,7 @@ class RepositoryConnection(object):
 #     * @throws RepositoryException
 #     *         If the statements could not be removed from the repository, for
 #     *         example because the repository is not writable.
+    @_invalidates_query_cache
     def clear(self, contexts=ALL_CONTEXTS):
         """
         Removes all statements from designated contexts in the repository.  If
@@ -918,12 +1183,14 @@ class RepositoryConnection(object):
         yield self
         self.closeSession()
 
+    @_invalidates_query_cache
     def commit(self):
         """
         Commits changes on an open session.
         """
         return self._get_mini_repository().commit()
 
+    @_invalidates_query_cache
     def rollback(self):
         """
         Rolls back changes on open session.
@@ -1004,3 +1271,18 @@ class GeoType:
             miniVertices = [miniRep.createSphericalGeoLiteral(self._getMiniGeoType(), coord[0], coord[1]) for coord in poly.vertices]
         miniRep.createPolygon(miniResource, miniVertices)
         return poly
+
+
+class ChunkReport(namedtuple('ChunkReport', 'index triples bytes encodeSeconds uploadSeconds')):
+    """
+    Describes a chunk sent by RepositoryConnection.addTriples: its number,
+    the triples and encoded bytes it held, and the seconds spent converting
+    and encoding it (on the worker thread) and uploading it.
+    """
+    __slots__ = ()
+
+    def getThroughput(self):
+        """
+        Triples per second uploaded.
+        """
+        return self.triples / (self.uploadSeconds or 0.000001)
@@ -13,6 +13,7 @@
 from __future__ import absolute_import
 
 from ..model import Statement, Value
+from franz.miniclient.request import RowStream
 
 # * A RepositoryResult is a result collection of objects (for example
 # * {@link org.openrdf.model.Statement}, {@link org.openrdf.model.Namespace},
@@ -38,7 +39,12 @@ from ..model import Statement, Value
 
 class RepositoryResult(object):  ## inherits IterationWrapper
     def __init__(self, string_tuples, subjectFilter=None, tripleIDs=False):
+        """
+        'string_tuples' is either a list, or a RowStream that produces
+        the tuples while they arrive from the server.
+        """
         self.string_tuples = string_tuples
+        self.streaming = isinstance(string_tuples, RowStream)
         self.cursor = 0
         self.nonDuplicateSet = None
         #self.limit = limit
@@ -58,8 +64,18 @@ class RepositoryResult(object):  ## inherits IterationWrapper
     def close(self):
         """
         Shut down the iterator, to insure that resources are free'd up.
+        For a streaming result, this aborts the transfer.
         """
-        pass
+        if self.streaming: self.string_tuples.close()
+
+    def _next_string_tuple(self):
+        if self.streaming:
+            return self.string_tuples.next()
+        if self.cursor >= len(self.string_tuples):
+            raise StopIteration
+        stringTuple = self.string_tuples[self.cursor]
+        self.cursor += 1
+        return stringTuple
 
     def next(self):
         """
@@ -73,23 +89,22 @@ class RepositoryResult(object):  ## inherits IterationWrapper
                 self.nonDuplicateSet = None
                 while (True):
                     stmt = self.next()
-                    if not stmt in savedNonDuplicateSet:
-                        savedNonDuplicateSet.add(stmt)
-                        return stmt                        
+                    ## Hashes the statement once, rather than for 'in' and add
+                    size = len(savedNonDuplicateSet)
+                    savedNonDuplicateSet.add(stmt)
+                    if len(savedNonDuplicateSet) > size:
+                        return stmt
             finally:
                 self.nonDuplicateSet = savedNonDuplicateSet
 #        elif self.limit and self.cursor >= self.limit:
 #            raise StopIteration
-        elif self.cursor < len(self.string_tuples):
-            stringTuple = self.string_tuples[self.cursor]
+        else:
+            stringTuple = self._next_string_tuple()
             if self.triple_ids:
                 stringTuple = RepositoryResult.normalize_quint(stringTuple)
-            self.cursor += 1
             if self.subjectFilter and not stringTuple[0] == self.subjectFilter:
                 return self.next()
             return self._createStatement(stringTuple);
-        else:
-            raise StopIteration
 
 #     * Switches on duplicate filtering while iterating over objects. The
 #     * RepositoryResult will keep track of the previously returned objects in a
@@ -118,9 +133,14 @@ class RepositoryResult(object):  ## inherits IterationWrapper
         isList = isinstance(collection, list)
         for stmt in self:
             if isList: collection.append(stmt)
-            else: collection.add(stmt)        
+            else: collection.add(stmt)
+        return collection
 
     def __len__(self):
+        """
+        The number of statements.  For a streaming result, this has to
+        read the remaining ones into memory.
+        """
         return len(self.string_tuples)
 
     def rowCount(self):
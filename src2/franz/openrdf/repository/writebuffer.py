@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+
+###############################################################################
+# Copyright (c) 2006-2009 Franz Inc.
+# All rights reserved. This program and the accompanying materials
+# are made available under the terms of the Eclipse Public License v1.0
+# which accompanies this distribution, and is available at
+# http://www.eclipse.org/legal/epl-v10.html
+###############################################################################
+
+import time
+
+ADD = 'add'
+REMOVE = 'remove'
+
+class WriteBuffer(object):
+    """
+    Collects the quads that a RepositoryConnection adds and removes one at
+    a time, and sends them with a single addStatements or deleteStatements
+    request per batch.  Runs of adds and removes are sent in the order they
+    were made, so the outcome is the same as without buffering.
+
+    A batch is sent once it holds 'size' quads or about 'bytes' bytes of
+    terms, or when a write finds the oldest pending quad to be older than
+    'maxAge' seconds.  The age is only checked when a quad is added, there
+    is no timer: the connection is not thread safe, so the buffer is only
+    sent from the thread that uses it.  The connection also flushes the
+    buffer before every other request it makes (reads, commit, rollback,
+    ...) and on close; call its flush() after the last write of a burst.  The
+    query cache of the connection is invalidated when a batch is sent.
+    """
+    SIZE = 1000
+    BYTES = 1048576
+    MAX_AGE = 5.0
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.size = WriteBuffer.SIZE
+        self.bytes = WriteBuffer.BYTES
+        self.maxAge = WriteBuffer.MAX_AGE
+        ## Keep pending quads between calls (write-behind), instead of
+        ## only while an iterable is added or removed:
+        self.persistent = False
+        self.depth = 0
+        self._clear()
+
+    def _clear(self):
+        self.runs = []
+        self.count = 0
+        self.byte_count = 0
+        self.started = None
+
+    def is_active(self):
+        return self.persistent or self.depth > 0
+
+    def add(self, quad):
+        self._append(ADD, quad)
+
+    def remove(self, quad):
+        self._append(REMOVE, quad)
+
+    def _append(self, kind, quad):
+        if not self.runs or self.runs[-1][0] != kind:
+            self.runs.append((kind, []))
+        self.runs[-1][1].append(quad)
+        self.count += 1
+        ## Terms, plus JSON quotes and separators
+        self.byte_count += sum(len(term) + 3 for term in quad if isinstance(term, basestring)) + 4
+        if self.started is None:
+            self.started = time.time()
+        if (self.count >= self.size or self.byte_count >= self.bytes or
+            (self.maxAge is not None and time.time() - self.started >= self.maxAge)):
+            self.flush()
+
+    def flush(self):
+        """
+        Send the pending quads.  They are dropped from the buffer first, so
+        a failing batch is not sent again.
+        """
+        runs = self.runs
+        self._clear()
+        mini = self.connection.mini_repository
+        try:
+            for kind, quads in runs:
+                if kind == ADD:
+                    mini.addStatements(quads, commitEvery=self.connection.add_commit_size)
+                else:
+                    mini.deleteStatements(quads)
+        finally:
+            if runs: self.connection._invalidate_query_cache()
@@ -9,9 +9,11 @@
 from __future__ import absolute_import
 from __future__ import with_statement
 
-from ..exceptions import RequestError
+from ..exceptions import QueryMissingFeatureException, RequestError
 from ..sail.allegrographserver import AllegroGraphServer
 from ..repository.repository import Repository
+from ..repository.parallelwriter import ParallelWriter
+from ..repository.bulkloader import BulkLoader, findFiles, splitFile, readRange
 from ...miniclient import repository
 from ..query.query import QueryLanguage
 from ..vocabulary.rdf import RDF
@@ -19,15 +21,17 @@ from ..vocabulary.rdfs import RDFS
 from ..vocabulary.owl import OWL
 from ..vocabulary.xmlschema import XMLSchema
 from ..query.dataset import Dataset
+from ..query.querycache import QueryCache, DiskQueryCache
 from ..rio.rdfformat import RDFFormat
 from ..rio.rdfwriter import  NTriplesWriter
 from ..rio.rdfxmlwriter import RDFXMLWriter
-from ..model import Literal, Statement, URI, ValueFactory
+from ..model import BNode, Literal, Statement, URI, ValueFactory
+from ..model import ntriples
 
 from nose.tools import eq_, assert_raises
 from nose import SkipTest
 
-import os, urllib, datetime, time, locale, threading
+import os, urllib, datetime, time, locale, pickle, threading
 
 locale.setlocale(locale.LC_ALL, '')
 
@@ -1798,3 +1802,482 @@ def test_namespace_management():
     conn.clearNamespaces(reset=True)
 
     assert namespaces == conn.getNamespaces()
+
+def test_streaming_results():
+    """
+    Test streaming getStatements and query results.
+    """
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    conn.addTriples([(conn.createURI("http://example.org/s%d" % i), p, conn.createLiteral(i))
+                     for i in range(5000)])
+
+    result = conn.getStatements(None, p, None, stream=True)
+    assert result.streaming
+    subjects = set(str(stmt.getSubject()) for stmt in result)
+    assert len(subjects) == 5000
+
+    result = conn.getStatements(None, p, None, stream=True)
+    result.next()
+    assert len(result) == 5000
+    assert sum(1 for stmt in result) == 4999
+
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "select ?s ?o { ?s <http://example.org/p> ?o }")
+    result = query.evaluate(stream=True)
+    assert result.getBindingNames() == ['s', 'o']
+    assert result.next()['s'].getURI().startswith("http://example.org/s")
+    # Abandon the rest of the transfer; the connection stays usable.
+    result.close()
+    assert_raises(StopIteration, result.next)
+    assert conn.size() == 5000
+
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "select ?s { ?s <http://example.org/none> ?o }")
+    result = query.evaluate(stream=True)
+    assert result.getBindingNames() == ['s']
+    assert len(result) == 0
+
+    query = conn.prepareGraphQuery(QueryLanguage.SPARQL, "construct { ?s ?p ?o } where { ?s ?p ?o }")
+    assert len(query.evaluate(stream=True)) == 5000
+
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "not sparql")
+    assert_raises(RequestError, query.evaluate, stream=True)
+
+def test_write_behind():
+    """
+    Test batching of statement adds and removes.
+    """
+    from ...miniclient.request import addRequestListener, removeRequestListener
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    statements = [conn.createStatement(conn.createURI("http://example.org/s%d" % i), p, conn.createLiteral(i))
+                  for i in range(2500)]
+    requests = []
+    addRequestListener(requests.append)
+    try:
+        conn.add(statements)
+        assert len(requests) == 3
+        assert conn.size() == 2500
+
+        conn.remove(statements[:500])
+        assert conn.size() == 2000
+
+        del requests[:]
+        conn.setWriteBehind(size=100, maxAge=None)
+        assert conn.write_behind
+        for stmt in statements[:50]:
+            conn.add(stmt)
+        conn.remove(statements[0])
+        assert len(requests) == 0
+        assert conn.size() == 2049
+        assert len(requests) == 3
+        conn.add(statements[0])
+        conn.setWriteBehind(False)
+        assert conn.size() == 2050
+
+        ## Buffered adds keep the commit size of the connection
+        del requests[:]
+        conn.setAddCommitSize(10)
+        conn.setWriteBehind(size=100, maxAge=None)
+        conn.add(statements[2000])
+        conn.flush()
+        conn.setWriteBehind(False)
+        conn.setAddCommitSize(None)
+        assert len(requests) == 1
+        assert "commit=10" in requests[0].url
+    finally:
+        removeRequestListener(requests.append)
+
+def test_add_triples_chunked():
+    """
+    Test adding a generator of triples in pipelined chunks.
+    """
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    triples = ((conn.createURI("http://example.org/s%d" % i), p, conn.createLiteral(i))
+               for i in xrange(25000))
+    reports = []
+    assert conn.addTriples(triples, chunkSize=10000, progress=reports.append) == 25000
+    assert [report.triples for report in reports] == [10000, 10000, 5000]
+    assert [report.index for report in reports] == [0, 1, 2]
+    assert all(report.bytes > 0 and report.getThroughput() > 0 for report in reports)
+    assert conn.size() == 25000
+
+    conn.clear()
+    triples = (("<http://example.org/s%d>" % i, "<http://example.org/p>", '"%d"' % i)
+               for i in xrange(1000))
+    assert conn.addTriples(triples, ntriples=True, chunkBytes=4096) == 1000
+    assert conn.size() == 1000
+
+def test_parallel_writer():
+    """
+    Test adding triples over several sessions.
+    """
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    triples = [(conn.createURI("http://example.org/s%d" % (i % 100)), p, conn.createLiteral(i))
+               for i in range(5000)]
+    with ParallelWriter(conn.repository, workers=4, batchSize=100, commitEvery=1000) as writer:
+        writer.addTriples(triples)
+        writer.addTriple(conn.createBNode(), p, conn.createLiteral("blank"))
+    stats = writer.getStats()
+    assert len(stats) == 4
+    assert sum(s.triples for s in stats) == 5001
+    assert all(s.error is None and s.commits > 0 for s in stats)
+    assert conn.size() == 5001
+    assert_raises(ValueError, writer.addTriple, conn.createBNode(), p, conn.createLiteral("late"))
+    assert_raises(ValueError, writer.flush)
+
+def test_bulk_loader():
+    """
+    Test loading the files of a directory over several sessions.
+    """
+    conn = connect()
+    files, missing = findFiles([CURRENT_DIRECTORY, "no-such-file.nt"])
+    assert os.path.join(os.path.abspath(CURRENT_DIRECTORY), "kennedy.ntriples") in files
+    assert missing == ["no-such-file.nt"]
+    snapshots = []
+    loader = BulkLoader(conn.repository, workers=2, retries=1, progress=snapshots.append,
+                        context=conn.createURI("http://example.org/bulk"))
+    summary = loader.load(CURRENT_DIRECTORY)
+    sizes = [result.size for result in summary.results]
+    assert sizes == sorted(sizes, reverse=True)
+    failed = summary.getFailed()
+    assert [os.path.basename(result.path) for result in failed] == ["kennedy-error.nt"]
+    assert failed[0].attempts == 2
+    assert all(result.attempts == 1 for result in summary.getLoaded())
+    assert summary.triples == conn.size() > 0
+    assert snapshots[-1].filesDone == len(summary.getLoaded())
+    assert snapshots[-1].bytesDone == summary.getBytes()
+    assert all(result.done for result in summary.getLoaded())
+    assert snapshots[-1].filesFailed == 1
+
+def test_bulk_loader_split():
+    """
+    Test loading one N-Triples file in ranges over several sessions.
+    """
+    conn = connect()
+    path = os.path.join(CURRENT_DIRECTORY, "kennedy.ntriples")
+    ranges = splitFile(path, 10000)
+    assert len(ranges) > 4
+    assert "".join("".join(readRange(path, start, end)) for start, end in ranges) == open(path, "rb").read()
+    summary = BulkLoader(conn.repository, workers=4, splitSize=10000).load(path)
+    assert len(summary.results) == len(ranges)
+    assert not summary.getFailed()
+    assert conn.size() == 1214
+    conn.addData('<http://example.org/s> <http://example.org/p> "o" <http://example.org/g> .\n', RDFFormat.NQUADS)
+    assert conn.size(conn.createURI("http://example.org/g")) == 1
+
+def test_add_compressed_file():
+    """
+    Test loading gzip and bzip2 compressed files.
+    """
+    import bz2, gzip, shutil, tempfile
+    conn = connect()
+    directory = tempfile.mkdtemp()
+    try:
+        data = open(os.path.join(CURRENT_DIRECTORY, "kennedy.ntriples"), "rb").read()
+        gzipped = gzip.open(os.path.join(directory, "kennedy.nt.gz"), "wb")
+        gzipped.write(data)
+        gzipped.close()
+        bzipped = bz2.BZ2File(os.path.join(directory, "kennedy.nt.bz2"), "wb")
+        bzipped.write(data)
+        bzipped.close()
+        conn.addFile(os.path.join(directory, "kennedy.nt.gz"), context=conn.createURI("http://example.org/gz"))
+        assert conn.size(conn.createURI("http://example.org/gz")) == 1214
+        summary = BulkLoader(conn.repository, workers=2).load(directory)
+        assert len(summary.getLoaded()) == 2
+        assert conn.size('null') == 1214
+    finally:
+        shutil.rmtree(directory)
+
+def test_query_cache():
+    """
+    Test answering repeated queries from a QueryCache.
+    """
+    conn = connect()
+    cache = QueryCache(ttl=60)
+    conn.setQueryCache(cache)
+    p = conn.createURI("http://example.org/p")
+    conn.addTriple(conn.createURI("http://example.org/s"), p, conn.createLiteral(1))
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "SELECT ?s WHERE { ?s ?p ?o }")
+    assert len(query.evaluate()) == 1
+    assert len(query.evaluate()) == 1
+    stats = cache.getStats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    query.setBinding("p", p)
+    assert len(query.evaluate()) == 1
+    assert cache.getStats().misses == 2
+    ## Writes through the connection invalidate the cached results
+    conn.addTriple(conn.createURI("http://example.org/s2"), p, conn.createLiteral(2))
+    assert len(cache) == 0
+    assert len(query.evaluate()) == 2
+    assert len(query.evaluate(stream=True)) == 2
+    assert cache.getStats().entries == 1
+    conn.setQueryCache(None)
+    assert len(query.evaluate()) == 2
+    assert cache.getStats().hits == 1
+
+def test_query_cache_invalidations():
+    """
+    Test that a write invalidates the query cache once, however many requests it makes.
+    """
+    conn = connect()
+    cache = QueryCache()
+    conn.setQueryCache(cache)
+    p = conn.createURI("http://example.org/p")
+    statements = [conn.createStatement(conn.createURI("http://example.org/s%d" % i), p, conn.createLiteral(i))
+                  for i in range(2500)]
+    conn.add(statements)
+    assert cache.getStats().invalidations == 1
+    ## Buffered writes invalidate when they are sent
+    conn.setWriteBehind(True)
+    conn.add(statements[0])
+    assert cache.getStats().invalidations == 1
+    conn.flush()
+    assert cache.getStats().invalidations == 2
+    conn.setWriteBehind(False)
+
+def test_disk_query_cache():
+    """
+    Test keeping query results on disk, across cache instances.
+    """
+    import shutil, tempfile
+    conn = connect()
+    directory = tempfile.mkdtemp()
+    try:
+        p = conn.createURI("http://example.org/p")
+        conn.addTriple(conn.createURI("http://example.org/s"), p, conn.createLiteral(1))
+        query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "SELECT ?s WHERE { ?s ?p ?o }")
+        conn.setQueryCache(QueryCache(backing=DiskQueryCache(directory)))
+        assert len(query.evaluate()) == 1
+        ## As after a restart
+        disk = DiskQueryCache(directory, probeInterval=0)
+        assert len(disk) == 1
+        conn.setQueryCache(disk)
+        assert len(query.evaluate()) == 1
+        assert disk.getStats().hits == 1
+        ## A write by another connection changes the size, which the probe notices
+        other = conn.repository.getConnection()
+        other.addTriple(conn.createURI("http://example.org/s2"), p, conn.createLiteral(2))
+        assert len(query.evaluate()) == 2
+        assert disk.getStats().hits == 1
+        ## A write through the connection moves the repository to a new generation
+        conn.addTriple(conn.createURI("http://example.org/s3"), p, conn.createLiteral(3))
+        assert disk.getStats().invalidations == 1
+        assert len(query.evaluate()) == 3
+        assert disk.getStats().hits == 1
+    finally:
+        shutil.rmtree(directory)
+
+def test_evaluate_many():
+    """
+    Test evaluating a query with many binding sets.
+    """
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    subjects = [conn.createURI("http://example.org/s%d" % i) for i in range(100)]
+    for i, subject in enumerate(subjects):
+        conn.addTriple(subject, p, conn.createLiteral(i))
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "SELECT ?o WHERE { ?s ?p ?o }")
+    query.setBinding("p", p)
+    seen = 0
+    for bindings, result in query.evaluateMany(({"s": subject} for subject in subjects), parallelism=4):
+        values = [bindingSet.getValue("o").toPython() for bindingSet in result]
+        assert values == [subjects.index(bindings["s"])]
+        seen += 1
+    assert seen == 100
+    prolog = conn.prepareTupleQuery(QueryLanguage.PROLOG, "(select (?s) (q ?s !<http://example.org/p> ?o))")
+    assert_raises(QueryMissingFeatureException, prolog.evaluateMany, [{}])
+
+def test_evaluate_paged():
+    """
+    Test reading a query result a page at a time.
+    """
+    conn = connect()
+    p = conn.createURI("http://example.org/p")
+    for i in range(95):
+        conn.addTriple(conn.createURI("http://example.org/s%02d" % i), p, conn.createLiteral(i))
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "SELECT ?s WHERE { ?s ?p ?o } ORDER BY ?s")
+    result = query.evaluatePaged(pageSize=10)
+    subjects = [str(bindingSet.getValue("s")) for bindingSet in result]
+    assert subjects == ["<http://example.org/s%02d>" % i for i in range(95)]
+    assert result.getOffset() == 95
+    ## Resuming, and a LIMIT of the query's own
+    query = conn.prepareTupleQuery(QueryLanguage.SPARQL, "SELECT ?s WHERE { ?s ?p ?o } ORDER BY ?s LIMIT 30")
+    subjects = [str(bindingSet.getValue("s")) for bindingSet in query.evaluatePaged(pageSize=7, offset=20)]
+    assert subjects == ["<http://example.org/s%02d>" % i for i in range(20, 30)]
+
+def test_multiple_contexts():
+    """
+    Test size, addTriple and removeTriples over many contexts.
+    """
+    conn = connect()
+    contexts = [conn.createURI("http://example.org/graph%d" % i) for i in range(30)]
+    p = conn.createURI("http://example.org/p")
+    for i in range(3):
+        conn.addTriple(conn.createURI("http://example.org/s%d" % i), p, conn.createLiteral(i), contexts=contexts)
+    assert conn.size() == 90
+    assert conn.size(contexts) == 90
+    assert conn.size(contexts[:10]) == 30
+    conn.removeTriples(conn.createURI("http://example.org/s0"), None, None, contexts[:20])
+    assert conn.size(contexts) == 70
+    conn.context_concurrency = 1
+    assert conn.size(contexts[15:]) == 40
+
+## NTRIPLES terms, and what they parse to: a URI string, a BNode id, or
+## the label, datatype and language of a literal.
+TRICKY_TERMS = [
+    (u'<http://example.org/a>', URI, u'http://example.org/a'),
+    (u'<http://example.org/caf\\u00E9>', URI, u'http://example.org/caf\xe9'),
+    (u'_:b0', BNode, u'b0'),
+    (u'""', Literal, (u'', None, None)),
+    (u'"plain"', Literal, (u'plain', None, None)),
+    (u'"caf\xe9"', Literal, (u'caf\xe9', None, None)),
+    (u'"tab\\tnewline\\nreturn\\r"', Literal, (u'tab\tnewline\nreturn\r', None, None)),
+    (u'"say \\"hi\\""', Literal, (u'say "hi"', None, None)),
+    (u'"back\\\\slash"', Literal, (u'back\\slash', None, None)),
+    (u'"ends in a backslash\\\\"', Literal, (u'ends in a backslash\\', None, None)),
+    (u'"\\\\u0041 is not an escape"', Literal, (u'\\u0041 is not an escape', None, None)),
+    (u'"\\u00E9t\\u00E9"', Literal, (u'\xe9t\xe9', None, None)),
+    (u'"\\U0001F600"', Literal, (u'\\U0001F600'.decode('unicode-escape'), None, None)),
+    (u'"<not a URI>"', Literal, (u'<not a URI>', None, None)),
+    (u'"_:b0"', Literal, (u'_:b0', None, None)),
+    (u'"@en"', Literal, (u'@en', None, None)),
+    (u'"^^<http://example.org/dt>"', Literal, (u'^^<http://example.org/dt>', None, None)),
+    (u'"chat"@fr', Literal, (u'chat', None, u'fr')),
+    (u'"colour"@EN-gb', Literal, (u'colour', None, u'en-gb')),
+    (u'"a \\"quoted\\" tag"@en', Literal, (u'a "quoted" tag', None, u'en')),
+    (u'"42"^^<http://www.w3.org/2001/XMLSchema#int>', Literal, (u'42', XMLSchema.INT, None)),
+    (u'"x"^^<http://example.org/dt>', Literal, (u'x', URI(u'http://example.org/dt'), None)),
+    (u'"\\"\\""^^<http://example.org/dt>', Literal, (u'""', URI(u'http://example.org/dt'), None)),
+    ]
+
+def test_parse_term():
+    """
+    Test parsing of tricky NTRIPLES terms.
+    """
+    for string in (None, ''):
+        assert Statement.stringTermToTerm(string) == string
+    for string, kind, expected in TRICKY_TERMS:
+        term = Statement.stringTermToTerm(string)
+        assert type(term) is kind, string
+        if kind is URI: eq_(term.getURI(), expected)
+        elif kind is BNode: eq_(term.getID(), expected)
+        else: eq_((term.getLabel(), term.getDatatype(), term.getLanguage()), expected)
+        ## URIs and BNodes are shared, Literals are not
+        assert (Statement.stringTermToTerm(string) is term) == (kind is not Literal)
+    assert Statement.stringTermToTerm(u'"42"^^<http://www.w3.org/2001/XMLSchema#int>').getDatatype() is XMLSchema.INT
+    ## Anything else is a plain literal
+    eq_(Statement.stringTermToTerm(u'17'), Literal(u'17'))
+
+def test_tricky_literals_roundtrip():
+    """
+    Test that tricky literals come back from the server as they were added.
+    """
+    conn = connect()
+    literals = [Literal(label, datatype, language) for string, kind, (label, datatype, language)
+                in TRICKY_TERMS if kind is Literal]
+    for i, literal in enumerate(literals):
+        conn.addTriple(conn.createURI("http://example.org/s%02d" % i), conn.createURI("http://example.org/p"), literal)
+    for statement in conn.getStatements(None, None, None):
+        i = int(statement.getSubject().getURI()[-2:])
+        eq_(statement.getObject(), literals[i])
+
+def test_interned_terms():
+    """
+    Test that equal terms in use are shared, and dropped when no longer used.
+    """
+    ntriples.clear_cache()
+    first = Statement(None, None, None)
+    first.setQuad([u'<http://example.org/s1>', u'<http://example.org/p>', u'"o"@en'])
+    second = Statement(None, None, None)
+    second.setQuad([u'<http://example.org/s2>', u'<http://example.org/p>', u'"o"@en'])
+    assert first.getPredicate() is second.getPredicate()
+    assert first.getObject() == second.getObject()
+    assert first.getObject() is not second.getObject()
+    assert first.getSubject() is not second.getSubject()
+    count = ntriples.interned_count()
+    assert count >= 3
+    ## Changing a literal does not change the other statement
+    first.getObject().setLanguage('de')
+    eq_(second.getObject().getLanguage(), 'en')
+    ## Without the cache, only the weak references keep terms shared
+    ntriples._cache.clear()
+    del first, second
+    assert ntriples.interned_count() < count
+
+def test_slotted_terms():
+    """
+    Test that statements and terms have no dictionary and can still be pickled.
+    """
+    statement = Statement(None, None, None)
+    statement.setQuad([u'<http://example.org/s>', u'<http://example.org/p>', u'"o"@en', u'_:c'])
+    terms = [statement.getSubject(), statement.getObject(), statement.getContext(), Literal(42)]
+    for value in [statement] + terms:
+        assert not hasattr(value, '__dict__')
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        copied = pickle.loads(pickle.dumps(statement, protocol))
+        assert copied == statement
+        eq_(copied.getContext(), statement.getContext())
+        for term in terms:
+            eq_(pickle.loads(pickle.dumps(term, protocol)), term)
+
+def test_term_equality():
+    """
+    Test equality and hashing of terms, and of statements parsed or not.
+    """
+    def statement(*strings):
+        statement = Statement(None, None, None)
+        statement.setQuad(list(strings))
+        return statement
+    assert URI("http://example.org/a") == URI("http://example.org/a")
+    assert not URI("http://example.org/a") != URI("http://example.org/a")
+    assert URI("http://example.org/a") == "<http://example.org/a>"
+    assert URI("http://example.org/a") != Literal("http://example.org/a")
+    assert Literal("1", XMLSchema.INT) != Literal("1")
+    assert Literal("chat", language="fr") != Literal("chat", language="en")
+    assert BNode("b1") != BNode("b2")
+    ## Different spellings of the same literal
+    first = statement(u'<http://example.org/s>', u'<http://example.org/p>', u'"caf\\u00E9"')
+    second = statement(u'<http://example.org/s>', u'<http://example.org/p>', u'"caf\\u00e9"')
+    same = statement(u'<http://example.org/s>', u'<http://example.org/p>', u'"caf\\u00e9"')
+    built = Statement(URI("http://example.org/s"), URI("http://example.org/p"), Literal(u'caf\xe9'))
+    eq_(hash(first), hash(second))
+    eq_(hash(first), hash(built))
+    assert second == same and second.subject is None
+    assert first == second and first == built and built == second
+    assert not first != second
+    eq_(len(set([first, second, same, built])), 1)
+    assert statement(u'<http://example.org/s>', u'<http://example.org/p>', u'"cafe"') != first
+
+def test_partial_statement_hash():
+    """
+    Test that statements with unset terms can be hashed.
+    """
+    partial = Statement(URI("http://example.org/s"), URI("http://example.org/p"), None)
+    eq_(hash(partial), hash(Statement(URI("http://example.org/s"), URI("http://example.org/p"), None)))
+    assert hash(partial) != hash(Statement(URI("http://example.org/s"), URI("http://example.org/p"), Literal("o")))
+    hash(Statement(None, None, None))
+
+def test_encode_ntriples():
+    """
+    Test NTRIPLES encoding of strings, columns of strings and terms.
+    """
+    from ..util.strings import encode_ntriple_string, encode_ntriple_strings
+    plain = 'http://example.org/plain'
+    assert encode_ntriple_string(plain) is plain
+    tricky = [u'tab\there', u'new\nline', u'say "hi"', u'back\\slash', u'caf\xe9', u'\u2603', 42, u'']
+    encoded = [u'tab\\there', u'new\\nline', u'say \\"hi\\"', u'back\\\\slash', u'caf\\u00E9', u'\\u2603', u'42', u'']
+    eq_([encode_ntriple_string(string) for string in tricky], encoded)
+    eq_(encode_ntriple_strings(tricky), encoded)
+    eq_(encode_ntriple_strings([plain, u'caf\xe9']), [plain, u'caf\\u00E9'])
+    ## Terms keep their encoding until they change
+    literal = Literal(u'caf\xe9', language='FR')
+    eq_(literal.toNTriples(), u'"caf\\u00E9"@fr')
+    assert literal.toNTriples() is literal.toNTriples()
+    literal.setLanguage(None)
+    literal.setDatatype(XMLSchema.STRING)
+    eq_(literal.toNTriples(), u'"caf\\u00E9"^^<http://www.w3.org/2001/XMLSchema#string>')
+    uri = URI(u'http://example.org/caf\xe9')
+    eq_(uri.toNTriples(), u'<http://example.org/caf\\u00E9>')
+    assert uri.toNTriples() is uri.toNTriples()
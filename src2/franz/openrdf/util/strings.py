@@ -39,39 +39,52 @@ def encode_ntriple_string(string):
     """
     Return a unicode string encoded in 7-bit ASCII containing the
     NTRIPLES escape sequences for non-ascii and other characters.
+    Strings that need no escapes, the common case, are returned as
+    they are.
     """
-
-    # Access these at local variable speeds since they are in a loop
-    HEX_MAP = encode_ntriple_string.HEX_MAP
-    LOWER_ASCII = encode_ntriple_string.LOWER_ASCII
-    QUOTE = encode_ntriple_string.QUOTE
-    UPPER_ASCII = encode_ntriple_string.UPPER_ASCII
-    
-    bytes = []
+    if not isinstance(string, basestring):
+        string = unicode(string)
+    pattern = encode_ntriple_string.pattern
+    if not pattern.search(string):
+        return string
     if not isinstance(string, unicode):
         string = unicode(string)
+    return pattern.sub(_encode_character, string)
 
-    for c in string:
-        ordl = ord(c)
-        if ordl >= LOWER_ASCII and ordl <= UPPER_ASCII and not ordl == QUOTE:
-            bytes.append(c)
-        else:
-            bytes.append(HEX_MAP.get(ordl) or ord2HHHH(ordl))
-    return ''.join(bytes)
+## Printable ASCII other than the quote and the backslash needs no escape
+encode_ntriple_string.pattern = re.compile(u'[^ !#-\\[\\]-~]')
 
 encode_ntriple_string.HEX_MAP = {
     hex2int('9'): r'\t',
     hex2int('A'): r'\n',
     hex2int('D'): r'\r',
-    hex2int('20'): chr(hex2int('20')), #blank
-    hex2int('21'): chr(hex2int('21')),
     hex2int('22'): r'\"',    
     hex2int('5C'): r'\\',    
     }
 
-encode_ntriple_string.LOWER_ASCII = hex2int('23')
-encode_ntriple_string.QUOTE = hex2int('5C')
-encode_ntriple_string.UPPER_ASCII = hex2int('7E')
+def _encode_character(match):
+    ordl = ord(match.group(0))
+    return encode_ntriple_string.HEX_MAP.get(ordl) or ord2HHHH(ordl)
+
+def encode_ntriple_strings(strings):
+    """
+    Return a list of the results of encode_ntriple_string for each of
+    'strings', a column of labels or URIs, which are all escaped in one
+    pass over their text.
+    """
+    strings = [string if isinstance(string, basestring) else unicode(string) for string in strings]
+    if not strings:
+        return strings
+    ## Newlines are escaped, so the separator can't be confused with the
+    ## encoded text, unless a string has one of its own.
+    text = u'\n'.join(strings)
+    if not encode_ntriple_strings.pattern.search(text):
+        return strings
+    if text.count(u'\n') != len(strings) - 1:
+        return [encode_ntriple_string(string) for string in strings]
+    return encode_ntriple_strings.pattern.sub(_encode_character, text).split(u'\n')
+
+encode_ntriple_strings.pattern = re.compile(u'[^\\n !#-\\[\\]-~]')
 
 def uriref(string): 
   uri = None
@@ -100,3 +113,26 @@ def literal(string):
 litvalue = r'"([^"\\]*(?:\\.[^"\\]*)*)"'
 litinfo = r'(?:@([a-z]+(?:-[a-z0-9]+)*)|\^\^' + uri_pattern + r')?'
 literal.pattern = re.compile(litvalue + litinfo + '$')
+
+def decode_ntriple_string(string):
+    """
+    Return 'string', the text of an NTRIPLES literal or URI, with its
+    escape sequences replaced by the characters they stand for.  Strings
+    without a backslash are returned unchanged.
+    """
+    if '\\' not in string:
+        return string
+    return decode_ntriple_string.pattern.sub(_decode_escape, string)
+
+decode_ntriple_string.pattern = re.compile(r'\\(?:u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)', re.DOTALL)
+decode_ntriple_string.ESCAPES = {
+    't': u'\t', 'b': u'\b', 'n': u'\n', 'r': u'\r', 'f': u'\f',
+    '"': u'"', "'": u"'", '\\': u'\\',
+    }
+
+def _decode_escape(match):
+    escape = match.group(0)
+    if len(escape) > 2:
+        ## \U escapes beyond the BMP become surrogate pairs on narrow builds
+        return str(escape).decode('unicode-escape')
+    return decode_ntriple_string.ESCAPES.get(escape[1], escape)